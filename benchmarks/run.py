@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+
+import argparse
+import datetime as dt
+import functools
+import json
+import platform
+import sys
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import attr
+import numpy as np
+
+from udg import Builder, Generator, ModelDefinition, TrafficModel
+from udg.data import rng, wroclaw
+from udg.data.utils import (
+    DecisionTree,
+    DynamicMultinomialSampler,
+    MultinomialSampler,
+    load_json,
+)
+from udg.features.person import Age, Schedule, Sex
+from udg.features.person.schedule import SetLengthStop
+from udg.types import Place, Region, Time, TransportMode
+from udg.utils import collect_generators
+
+
+@attr.frozen
+class Result:
+    name: str
+    operations: int
+    seconds: float
+
+    @property
+    def ops_per_second(self) -> float:
+        return self.operations / self.seconds
+
+    def to_dict(self) -> dict[str, float]:
+        return {
+            "operations": self.operations,
+            "seconds": self.seconds,
+            "ops_per_second": self.ops_per_second,
+        }
+
+
+Benchmark: t.TypeAlias = t.Callable[[argparse.Namespace], t.Iterator[Result]]
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def benchmark(group: str) -> t.Callable[[Benchmark], Benchmark]:
+    def register(func: Benchmark) -> Benchmark:
+        BENCHMARKS[group] = func
+        return func
+
+    return register
+
+
+def measure(
+    name: str, func: t.Callable[[], t.Any], operations: int, repeat: int
+) -> Result:
+    # Best of `repeat` runs, the other ones are mostly noise from the machine
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return Result(name=name, operations=operations, seconds=best)
+
+
+def draw(func: t.Callable[[], t.Any], n: int) -> t.Callable[[], None]:
+    def run() -> None:
+        for _ in range(n):
+            func()
+
+    return run
+
+
+class FixedScheduleMaker(Generator[Schedule]):
+    # `z_palca.ScheduleMaker` uses stops that cannot be exported to MATSim
+    def generate(self, age: Age) -> Schedule:
+        stop = SetLengthStop(
+            start_time=Time(hour=8),
+            place=Place(id=f"work_{age}", region=Region(age), x=age, y=age),
+            transport_mode=TransportMode.PUBLIC_TRANSPORT,
+            duration=dt.timedelta(hours=8),
+        )
+        return Schedule(stops=[stop])
+
+
+def age_sampler() -> DynamicMultinomialSampler:
+    age = wroclaw.census.age.AgeSampler()
+    return age._sampler.sampler_for(Sex.F)  # type: ignore[return-value]
+
+
+def z_palca_builder() -> Builder:
+    generators = (cls() for cls in collect_generators(wroclaw.z_palca))
+    return Builder(ModelDefinition.from_generators(*generators))
+
+
+def wroclaw_builder() -> Builder | None:
+    generator_classes: list[type[Generator]] = [
+        wroclaw.unsorted.home.HomeSampler,
+        wroclaw.unsorted.schedule.ScheduleMaker,
+        wroclaw.unsorted.transport_preferences.TransportPreferencesSampler,
+        wroclaw.wds2017.bike_number.BikeNumberSampler,
+        wroclaw.wds2017.car_number.CarNumberSampler,
+        *collect_generators(wroclaw.census),
+    ]
+
+    try:
+        generators = [generator_cls() for generator_cls in generator_classes]
+    except FileNotFoundError as e:
+        print(f"Skipping the Wroclaw builder, missing data: {e}")
+        return None
+
+    return Builder(ModelDefinition.from_generators(*generators))
+
+
+def serialization_builder() -> Builder:
+    generators = (
+        *(cls() for cls in collect_generators(wroclaw.census)),
+        wroclaw.wds2017.bike_number.BikeNumberSampler(),
+        wroclaw.wds2017.car_number.CarNumberSampler(),
+        FixedScheduleMaker(),
+    )
+    return Builder(ModelDefinition.from_generators(*generators))
+
+
+@benchmark("samplers")
+def samplers(args: argparse.Namespace) -> t.Iterator[Result]:
+    n = args.draws
+
+    household_structure = wroclaw.census.household_structure.HouseholdStructureSampler()
+    yield measure(
+        "MultinomialSampler.sample[household_structure]",
+        draw(household_structure._sampler.sample, n),
+        n,
+        args.repeat,
+    )
+
+    regions = MultinomialSampler.from_dict(
+        load_json("wroclaw/unsorted/region.json", structure=[Region])
+    )
+    yield measure(
+        "MultinomialSampler.sample[region]",
+        draw(regions.sample, n),
+        n,
+        args.repeat,
+    )
+
+    preferences = wroclaw.unsorted.transport_preferences.TransportPreferencesSampler()
+    bicycle_comfort = preferences._bicycle_comfort
+    yield measure(
+        "ConditionalSampler.sample[bicycle_comfort]",
+        draw(lambda: bicycle_comfort.sample(Age(35), Sex.F), n),
+        n,
+        args.repeat,
+    )
+
+    age = age_sampler()
+    yield measure(
+        "DynamicMultinomialSampler.sample",
+        draw(lambda: age.sample(from_=18, to=60), n),
+        n,
+        args.repeat,
+    )
+
+    # Ranged draws drain the buffer of matching values, use a fresh one
+    age = age_sampler()
+    yield measure(
+        "DynamicMultinomialSampler.sample_normal",
+        draw(lambda: age.sample_normal(mu=40, sigma=10), n),
+        n,
+        args.repeat,
+    )
+
+    tree = DecisionTree.from_pickle("wroclaw/kbr/transport_mode.pkl", out=TransportMode)
+    yield measure(
+        "DecisionTree.predict",
+        draw(lambda: tree.predict(3, 3, 2, 2, 2, 3, 1, 1, 4.5), n),
+        n,
+        args.repeat,
+    )
+
+    rows = np.tile([3, 3, 2, 2, 2, 3, 1, 1, 4.5], (n, 1))
+    yield measure(
+        "DecisionTree.predict_many",
+        functools.partial(tree.predict_many, rows),
+        n,
+        args.repeat,
+    )
+
+
+@benchmark("builder")
+def builder(args: argparse.Namespace) -> t.Iterator[Result]:
+    builders = {"z_palca": z_palca_builder(), "wroclaw": wroclaw_builder()}
+
+    for name, model_builder in builders.items():
+        if model_builder is None:
+            continue
+
+        for scale in args.scales:
+            yield measure(
+                f"Builder.build_model_until[{name},{scale}]",
+                functools.partial(
+                    model_builder.build_model_until,
+                    scale,
+                    threads=args.threads,
+                ),
+                scale,
+                args.repeat,
+            )
+
+
+def draw_in_threads(
+    func: t.Callable[[], t.Any],
+    n: int,
+    threads: int,
+) -> t.Callable[[], None]:
+    def run_stream(index: int) -> None:
+        with rng.stream(np.random.default_rng(index)):
+            for _ in range(n // threads):
+                func()
+
+    def run() -> None:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(run_stream, range(threads)))
+
+    return run
+
+
+@benchmark("threads")
+def threads(args: argparse.Namespace) -> t.Iterator[Result]:
+    # The samplers are shared by all the threads, only free-threaded builds of
+    # CPython can scale the pure Python parts beyond a single core
+    n = args.draws
+    household_structure = wroclaw.census.household_structure.HouseholdStructureSampler()
+    preferences = wroclaw.unsorted.transport_preferences.TransportPreferencesSampler()
+    z_palca = z_palca_builder()
+
+    for count in args.thread_counts:
+        yield measure(
+            f"MultinomialSampler.sample[threads={count}]",
+            draw_in_threads(household_structure._sampler.sample, n, count),
+            n - n % count,
+            args.repeat,
+        )
+        yield measure(
+            f"ConditionalSampler.sample[threads={count}]",
+            draw_in_threads(
+                lambda: preferences._bicycle_comfort.sample(Age(35), Sex.F),
+                n,
+                count,
+            ),
+            n - n % count,
+            args.repeat,
+        )
+
+        # Every thread draws from its own buffer of the shared sampler
+        age = age_sampler()
+        yield measure(
+            f"DynamicMultinomialSampler.sample[threads={count}]",
+            draw_in_threads(lambda: age.sample(from_=18, to=60), n, count),
+            n - n % count,
+            args.repeat,
+        )
+
+        for scale in args.scales:
+            yield measure(
+                f"Builder.build_model_until[z_palca,{scale},threads={count}]",
+                functools.partial(z_palca.build_model_until, scale, threads=count),
+                scale,
+                args.repeat,
+            )
+
+
+@benchmark("serialization")
+def serialization(args: argparse.Namespace) -> t.Iterator[Result]:
+    builder = serialization_builder()
+
+    for scale in args.scales:
+        model = builder.build_model_until(scale, seed=0)
+        data = model.to_dict()
+
+        yield measure(
+            f"TrafficModel.to_dict[{scale}]",
+            model.to_dict,
+            model.person_count,
+            args.repeat,
+        )
+        yield measure(
+            f"TrafficModel.from_dict[{scale}]",
+            functools.partial(TrafficModel.from_dict, data),
+            model.person_count,
+            args.repeat,
+        )
+        yield measure(
+            f"TrafficModel.to_matsim_xml[{scale}]",
+            model.to_matsim_xml,
+            model.person_count,
+            args.repeat,
+        )
+
+
+def compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    tolerance: float,
+) -> list[str]:
+    regressions = []
+
+    for name, result in results.items():
+        if (expected := baseline.get(name)) is None:
+            continue
+
+        change = result["ops_per_second"] / expected["ops_per_second"] - 1
+        print(f"{name:<60} {change:+.1%}")
+
+        if change < -tolerance:
+            regressions.append(name)
+
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "groups",
+        nargs="*",
+        default=list(BENCHMARKS),
+        help=f"benchmark groups to run, any of: {', '.join(BENCHMARKS)}",
+    )
+    parser.add_argument(
+        "--scales",
+        type=lambda s: [int(v) for v in s.split(",")],
+        default=[1_000, 100_000, 1_000_000],
+        help="comma separated person numbers for the builder/serialization groups",
+    )
+    parser.add_argument("--draws", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument(
+        "--thread-counts",
+        type=lambda s: [int(v) for v in s.split(",")],
+        default=[1, 2, 4, 8],
+        help="comma separated thread numbers for the threads group",
+    )
+    parser.add_argument("--save", type=Path, help="write the results as a baseline")
+    parser.add_argument("--compare", type=Path, help="baseline to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed relative drop of throughput before failing the comparison",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    results: dict[str, dict[str, float]] = {}
+
+    for group in args.groups:
+        for result in BENCHMARKS[group](args):
+            print(f"{result.name:<60} {result.ops_per_second:>14,.0f} ops/s")
+            results[result.name] = result.to_dict()
+
+    if args.save is not None:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        output = {
+            "python": sys.version,
+            "platform": platform.platform(),
+            "gil_enabled": getattr(sys, "_is_gil_enabled", lambda: True)(),
+            "results": results,
+        }
+        args.save.write_text(json.dumps(output, indent=4) + "\n")
+
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text())["results"]
+
+        if regressions := compare(results, baseline, args.tolerance):
+            sys.exit(f"Throughput regressed for: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+import argparse
+import logging
+from pathlib import Path
+
+from udg.data.bundle import build_bundle
+from udg.data.utils import BUNDLE, DATA
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data-dir", type=Path, default=DATA)
+    parser.add_argument("--output-dir", type=Path, default=BUNDLE)
+    return parser.parse_args()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+
+    manifest = build_bundle(args.data_dir, args.output_dir)
+    print(f"Bundled {len(manifest['trees'])} trees into {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+import argparse
+from pathlib import Path
+
+import polars as pl
+
+from udg.data.facilities import COLUMNS, write_store
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("facilities_path", type=Path)
+    parser.add_argument(
+        "output_path",
+        type=Path,
+        nargs="?",
+        help="defaults to the path of the facilities without the .csv suffix",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    output_path = args.output_path or args.facilities_path.with_suffix("")
+
+    facilities = pl.read_csv(args.facilities_path, columns=list(COLUMNS))
+    manifest = write_store(facilities, output_path, source=args.facilities_path)
+    print(f"Stored {manifest['rows']} facilities in {output_path}")
+
+
+if __name__ == "__main__":
+    main()
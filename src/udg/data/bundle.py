@@ -0,0 +1,98 @@
+import hashlib
+import json
+import logging
+import pickle
+import typing as t
+from pathlib import Path
+
+import attr
+import numpy as np
+import orjson
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+VERSION = 2
+
+
+def source_hash(path: Path) -> str:
+    # Entries of files changed after the bundle was built are ignored, unlike the
+    # modification times the contents survive wheels and git checkouts
+    with path.open("rb") as file:
+        return hashlib.file_digest(file, "sha1").hexdigest()
+
+
+def tree_arrays(classifier: t.Any) -> dict[str, np.ndarray]:
+    tree = classifier.tree_
+    return {
+        "feature": tree.feature.astype(np.intp),
+        "threshold": tree.threshold.astype(np.float64),
+        "left": tree.children_left.astype(np.intp),
+        "right": tree.children_right.astype(np.intp),
+        "leaf_class": tree.value[:, 0, :].argmax(axis=1).astype(np.intp),
+    }
+
+
+@attr.define
+class Bundle:
+    _data: Path
+    _path: Path
+    _manifest: dict
+
+    @classmethod
+    def open(cls, data: Path, path: Path) -> t.Self | None:
+        try:
+            manifest = orjson.loads((path / MANIFEST).read_bytes())
+        except FileNotFoundError:
+            return None
+
+        if manifest.get("version") != VERSION:
+            logger.warning("Ignoring the data bundle in %s, it is outdated", path)
+            return None
+
+        return cls(data=data, path=path, manifest=manifest)
+
+    def _entry(self, relative_path: str) -> dict | None:
+        entry = self._manifest["trees"].get(relative_path)
+
+        if entry is None or entry["source"] != source_hash(self._data / relative_path):
+            return None
+
+        return entry
+
+    def _array(self, name: str) -> np.ndarray:
+        return np.load(self._path / name, mmap_mode="r")
+
+    def load_tree(
+        self, relative_path: str
+    ) -> tuple[dict[str, np.ndarray], list] | None:
+        if (entry := self._entry(relative_path)) is None:
+            return None
+
+        arrays = {name: self._array(file) for name, file in entry["arrays"].items()}
+        return arrays, entry["classes"]
+
+
+def build_bundle(data: Path, output: Path) -> dict:
+    output.mkdir(parents=True, exist_ok=True)
+    manifest: dict = {"version": VERSION, "trees": {}}
+
+    def save(relative_path: Path, name: str, array: np.ndarray) -> str:
+        file = f"{str(relative_path.with_suffix('')).replace('/', '.')}.{name}.npy"
+        np.save(output / file, array)
+        return file
+
+    for path in sorted(data.rglob("*.pkl")):
+        relative_path = path.relative_to(data)
+        classifier = pickle.loads(path.read_bytes())
+        manifest["trees"][str(relative_path)] = {
+            "source": source_hash(path),
+            "classes": classifier.classes_.tolist(),
+            "arrays": {
+                name: save(relative_path, name, array)
+                for name, array in tree_arrays(classifier).items()
+            },
+        }
+
+    (output / MANIFEST).write_text(json.dumps(manifest, indent=2) + "\n")
+    return manifest
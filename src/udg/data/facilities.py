@@ -0,0 +1,246 @@
+import functools
+import json
+import logging
+import typing as t
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+
+import attr
+import numpy as np
+import orjson
+import polars as pl
+
+from udg.data.bundle import source_hash
+from udg.data.rng import get_rng
+from udg.data.utils import DATA, load_csv, shared
+from udg.types import Place, Region
+
+logger = logging.getLogger(__name__)
+
+K = t.TypeVar("K")
+
+MANIFEST = "manifest.json"
+VERSION = 1
+# Columns written by scripts/osm/prepare_facilities.py
+COLUMNS = ("id", "category", "tag", "name", "region_id", "x", "y")
+CATEGORICAL = ("category", "tag")
+
+
+def _encode(frame: pl.DataFrame) -> tuple[dict[str, np.ndarray], dict[str, list[str]]]:
+    arrays: dict[str, np.ndarray] = {}
+    categories: dict[str, list[str]] = {}
+
+    for name in frame.columns:
+        column = frame[name]
+
+        if column.dtype == pl.Utf8:
+            # Strings are stored fixed-width so the arrays can be memory-mapped
+            values = column.fill_null("").to_numpy().astype(np.str_)
+
+            if name in CATEGORICAL:
+                uniques, codes = np.unique(values, return_inverse=True)
+                categories[name] = uniques.tolist()
+                values = codes.astype(np.int32)
+
+            arrays[name] = values
+        else:
+            arrays[name] = column.to_numpy()
+
+    return arrays, categories
+
+
+def store_path(relative_path: str) -> Path:
+    return (DATA / relative_path).with_suffix("")
+
+
+def write_store(
+    frame: pl.DataFrame,
+    path: Path,
+    source: Path | None = None,
+) -> dict:
+    path.mkdir(parents=True, exist_ok=True)
+    arrays, categories = _encode(frame)
+
+    manifest: dict = {
+        "version": VERSION,
+        "rows": len(frame),
+        "source": source_hash(source) if source is not None else None,
+        "columns": {},
+    }
+
+    for name, array in arrays.items():
+        np.save(path / f"{name}.npy", array)
+        manifest["columns"][name] = {
+            "file": f"{name}.npy",
+            "categories": categories.get(name),
+        }
+
+    (path / MANIFEST).write_text(json.dumps(manifest, indent=2) + "\n")
+    return manifest
+
+
+def read_store(path: Path) -> tuple[dict[str, np.ndarray], dict[str, list[str]]]:
+    manifest = orjson.loads((path / MANIFEST).read_bytes())
+
+    if manifest["version"] != VERSION:
+        raise ValueError(f"Unsupported facilities store version in {path}")
+
+    arrays = {
+        name: np.load(path / column["file"], mmap_mode="r")
+        for name, column in manifest["columns"].items()
+    }
+    categories = {
+        name: column["categories"]
+        for name, column in manifest["columns"].items()
+        if column["categories"] is not None
+    }
+    return arrays, categories
+
+
+def _store_is_fresh(path: Path, source: Path) -> bool:
+    try:
+        manifest = orjson.loads((path / MANIFEST).read_bytes())
+    except FileNotFoundError:
+        return False
+
+    # Only the store is needed when the CSV is not there
+    if not source.exists() or manifest["source"] == source_hash(source):
+        return True
+
+    logger.warning("Ignoring the facilities store in %s, the CSV has changed", path)
+    return False
+
+
+@attr.define
+class Facilities:
+    ids: np.ndarray
+    tag_codes: np.ndarray
+    tags: list[str]
+    regions: np.ndarray
+    xs: np.ndarray
+    ys: np.ndarray
+    # Facilities read from a store are pickled as its path, processes using
+    # them map the same files instead of each getting a copy of the arrays
+    _store: Path | None = attr.field(default=None, kw_only=True)
+
+    @classmethod
+    def from_arrays(
+        cls,
+        arrays: Mapping[str, np.ndarray],
+        categories: Mapping[str, list[str]],
+        store: Path | None = None,
+    ) -> t.Self:
+        return cls(
+            ids=arrays["id"],
+            tag_codes=arrays["tag"],
+            tags=categories["tag"],
+            regions=arrays["region_id"],
+            xs=arrays["x"],
+            ys=arrays["y"],
+            store=store,
+        )
+
+    @classmethod
+    def from_frame(cls, facilities: pl.DataFrame) -> t.Self:
+        return cls.from_arrays(*_encode(facilities))
+
+    @classmethod
+    def open(cls, path: Path) -> t.Self:
+        return cls.from_arrays(*read_store(path), store=path)
+
+    @classmethod
+    def _load(cls, relative_path: str) -> t.Self:
+        path = store_path(relative_path)
+        if _store_is_fresh(path, DATA / relative_path):
+            return cls.open(path)
+
+        return cls.from_frame(load_csv(relative_path))
+
+    @classmethod
+    def load(cls, relative_path: str) -> t.Self:
+        return shared(
+            ("facilities", relative_path),
+            functools.partial(cls._load, relative_path),
+        )
+
+    def __reduce__(self) -> str | tuple[t.Any, ...]:
+        if self._store is None:
+            return super().__reduce__()
+
+        return Facilities.open, (self._store,)
+
+    def rows_with_tags(self, tags: Iterable[str]) -> np.ndarray:
+        wanted = set(tags)
+        codes = [i for i, tag in enumerate(self.tags) if tag in wanted]
+        # Offsets stay in the order of the file, like the rows of a filter
+        return np.flatnonzero(np.isin(self.tag_codes, codes))
+
+    def place(self, row: int) -> Place:
+        return Place(
+            id=str(self.ids[row]),
+            region=Region(self.regions[row]),
+            x=float(self.xs[row]),
+            y=float(self.ys[row]),
+        )
+
+
+@attr.define
+class FacilityIndex(t.Generic[K]):
+    _facilities: Facilities
+    _rows: dict[tuple[K, Region], np.ndarray]
+    _fallback: dict[K, np.ndarray]
+
+    @classmethod
+    def from_facilities(
+        cls,
+        facilities: Facilities,
+        tag_mapping: Mapping[K, Iterable[str]],
+    ) -> t.Self:
+        rows: dict[tuple[K, Region], np.ndarray] = {}
+        fallback: dict[K, np.ndarray] = {}
+
+        for key, key_tags in tag_mapping.items():
+            key_rows = facilities.rows_with_tags(key_tags)
+            key_regions = facilities.regions[key_rows]
+            fallback[key] = key_rows
+
+            for region in np.unique(key_regions):
+                rows[key, Region(region)] = key_rows[key_regions == region]
+
+        return cls(facilities=facilities, rows=rows, fallback=fallback)
+
+    @classmethod
+    def from_frame(
+        cls,
+        facilities: pl.DataFrame,
+        tag_mapping: Mapping[K, Iterable[str]],
+    ) -> t.Self:
+        return cls.from_facilities(Facilities.from_frame(facilities), tag_mapping)
+
+    @classmethod
+    def load(
+        cls,
+        relative_path: str,
+        tag_mapping: Mapping[K, Iterable[str]],
+    ) -> t.Self:
+        return cls.from_facilities(Facilities.load(relative_path), tag_mapping)
+
+    def rows_for(self, key: K, region: Region) -> np.ndarray:
+        rows = self._rows.get((key, region))
+
+        if rows is None:
+            # TODO: Is this really the correct approach? Isn't it better to take
+            # anything in the region?
+            return self._fallback[key]
+
+        return rows
+
+    def sample_row(self, key: K, region: Region) -> int:
+        rows = self.rows_for(key, region)
+        return int(rows[get_rng().integers(len(rows))])
+
+    def place(self, row: int) -> Place:
+        return self._facilities.place(row)
+
+    def sample(self, key: K, region: Region) -> Place:
+        return self.place(self.sample_row(key, region))
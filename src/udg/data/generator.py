@@ -1,5 +1,6 @@
 import abc
 import typing as t
+from collections.abc import Sequence
 
 import attr
 
@@ -18,6 +19,18 @@ ThingToGenerate = t.TypeVar(
 
 @attr.define
 class Generator(abc.ABC, t.Generic[ThingToGenerate]):
+    # Generators whose output depends only on their arguments, the builder can
+    # then reuse the results of previous calls
+    deterministic: t.ClassVar[bool] = False
+
     @abc.abstractmethod
     def generate(self, *args, **kwargs) -> ThingToGenerate:
         pass
+
+    def generate_batch(self, size: int, *args, **kwargs) -> Sequence[ThingToGenerate]:
+        # Generators can override this with a vectorized version, the columns in
+        # `kwargs` are named the same as the parameters of `generate`.
+        return [
+            self.generate(**{name: column[i] for name, column in kwargs.items()})
+            for i in range(size)
+        ]
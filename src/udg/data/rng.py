@@ -0,0 +1,169 @@
+import contextlib
+import random
+import threading
+import typing as t
+from contextvars import ContextVar
+
+import attr
+import numpy as np
+
+Seed: t.TypeAlias = int | np.random.SeedSequence | None
+
+# Numbers drawn at once by the buffered functions, starting small so that short
+# streams like the ones of single households do not draw much more than they need
+MIN_BLOCK_SIZE = 64
+MAX_BLOCK_SIZE = 4096
+
+# Spawn key of the segments, so their sequences differ from the ones of the streams
+_SEGMENT_KEY = 2**32 - 1
+
+S = t.TypeVar("S")
+
+
+@attr.define
+class Segment:
+    # State carried over from one stream to the next, like the buffers of the dynamic
+    # samplers, which depends only on the sequence of the segment
+    index: int
+    _sequence: np.random.SeedSequence
+    _states: dict[int, t.Any] = attr.field(init=False, factory=dict)
+
+    @classmethod
+    def spawn(cls, root: np.random.SeedSequence, index: int) -> t.Self:
+        return cls(
+            index,
+            np.random.SeedSequence(
+                root.entropy,
+                spawn_key=(*root.spawn_key, _SEGMENT_KEY, index),
+                pool_size=root.pool_size,
+            ),
+        )
+
+    def state(self, key: int, create: t.Callable[[np.random.Generator], S]) -> S:
+        # New states are seeded in the order they are created in
+        if (state := self._states.get(key)) is None:
+            generator = np.random.default_rng(self._sequence.spawn(1)[0])
+            state = self._states[key] = create(generator)
+
+        return state
+
+
+@attr.define
+class _Stream:
+    generator: np.random.Generator
+    segment: Segment | None = None
+
+    _uniforms: list[float] = attr.field(init=False, factory=list)
+    _normals: list[float] = attr.field(init=False, factory=list)
+    _uniform_block_size: int = attr.field(init=False, default=MIN_BLOCK_SIZE)
+    _normal_block_size: int = attr.field(init=False, default=MIN_BLOCK_SIZE)
+
+    def uniform(self) -> float:
+        if not self._uniforms:
+            self._uniforms = self.generator.random(self._uniform_block_size).tolist()
+            self._uniform_block_size = min(2 * self._uniform_block_size, MAX_BLOCK_SIZE)
+
+        return self._uniforms.pop()
+
+    def standard_normal(self) -> float:
+        if not self._normals:
+            self._normals = self.generator.standard_normal(
+                self._normal_block_size
+            ).tolist()
+            self._normal_block_size = min(2 * self._normal_block_size, MAX_BLOCK_SIZE)
+
+        return self._normals.pop()
+
+
+_sequence = np.random.SeedSequence()
+_default = _Stream(np.random.default_rng(_sequence))
+_stream: ContextVar[_Stream | None] = ContextVar("stream", default=None)
+
+_local = threading.local()
+_spawn_lock = threading.Lock()
+
+
+def _thread_stream() -> _Stream:
+    # Generators are not thread safe, so outside of a stream every thread other than
+    # the main one draws from its own generator spawned from the default sequence
+    if getattr(_local, "sequence", None) is not _sequence:
+        with _spawn_lock:
+            _local.stream = _Stream(np.random.default_rng(_sequence.spawn(1)[0]))
+            _local.sequence = _sequence
+
+    return _local.stream
+
+
+def _current() -> _Stream:
+    current = _stream.get()
+
+    if current is not None:
+        return current
+
+    if threading.current_thread() is threading.main_thread():
+        return _default
+
+    return _thread_stream()
+
+
+def get_rng() -> np.random.Generator:
+    return _current().generator
+
+
+def segment_state(key: int, create: t.Callable[[np.random.Generator], S]) -> S | None:
+    # None outside of a stream with a segment
+    if (segment := _current().segment) is None:
+        return None
+
+    return segment.state(key, create)
+
+
+# Single numbers taken from blocks drawn in advance, to avoid calling NumPy for
+# every one of them
+def uniform() -> float:
+    return _current().uniform()
+
+
+def standard_normal() -> float:
+    return _current().standard_normal()
+
+
+def seed_sequence(entropy: Seed = None) -> np.random.SeedSequence:
+    if isinstance(entropy, np.random.SeedSequence):
+        return entropy
+
+    return np.random.SeedSequence(entropy)
+
+
+def seed(entropy: Seed = None) -> None:
+    global _default, _sequence
+
+    _sequence = seed_sequence(entropy)
+
+    # Generators that use the `random` module are seeded from the same sequence
+    _default = _Stream(np.random.default_rng(_sequence))
+    random.seed(int(_sequence.generate_state(1)[0]))
+
+
+def spawn(root: np.random.SeedSequence, index: int) -> np.random.Generator:
+    # Same as `root.spawn(index + 1)[index]`, but without the internal counter,
+    # so the n-th stream does not depend on how many were spawned before it
+    child = np.random.SeedSequence(
+        root.entropy,
+        spawn_key=(*root.spawn_key, index),
+        pool_size=root.pool_size,
+    )
+    return np.random.default_rng(child)
+
+
+@contextlib.contextmanager
+def stream(
+    generator: np.random.Generator,
+    segment: Segment | None = None,
+) -> t.Iterator[np.random.Generator]:
+    token = _stream.set(_Stream(generator, segment))
+
+    try:
+        yield generator
+    finally:
+        _stream.reset(token)
@@ -1,22 +1,29 @@
 import abc
+import bisect
+import functools
 import logging
+import math
 import pickle
 import typing as t
+import weakref
+from collections.abc import Sequence
 from pathlib import Path
-from threading import Lock
+from threading import RLock, local
 
 import attr
 import numpy as np
 import orjson
 import polars as pl
-from sklearn.tree import DecisionTreeClassifier
 
+from udg.data.bundle import Bundle, tree_arrays
+from udg.data.rng import get_rng, segment_state, standard_normal, stream, uniform
 from udg.features import FamilyFeature, HouseholdFeature, PersonFeature
 from udg.features.person import Age
 
 logger = logging.getLogger(__name__)
 
 DATA = Path(__file__).parent.parent / "_data"
+BUNDLE = DATA / "bundle"
 T = t.TypeVar("T")
 I = t.TypeVar("I", bound=int)
 
@@ -41,18 +48,55 @@ def _structure_dict(
     return dict_func({cls(k): _structure_dict(v, rest, out) for k, v in data.items()})
 
 
+@functools.cache
+def _bundle() -> Bundle | None:
+    return Bundle.open(DATA, BUNDLE)
+
+
+class _SharedDict(dict):
+    # Plain dicts cannot be weakly referenced
+    __slots__ = ("__weakref__",)
+
+
+_registry: weakref.WeakValueDictionary[t.Hashable, t.Any] = (
+    weakref.WeakValueDictionary()
+)
+_registry_lock = RLock()
+
+
+def shared(key: t.Hashable, load: t.Callable[[], T]) -> T:
+    # Data loaded once for the whole process and shared by every generator using
+    # it, it is dropped from the registry when none of them references it anymore
+    with _registry_lock:
+        value = _registry.get(key)
+
+        if value is None:
+            value = load()
+
+            try:
+                _registry[key] = value
+            except TypeError:
+                logger.debug("%r cannot be shared, it is not weakly referenceable", key)
+
+    return value
+
+
 def load_json(
     relative_path: str,
     structure: list[t.Callable] | None = None,
     out: t.Callable | None = None,
 ) -> dict:
-    path = DATA / relative_path
-    data = orjson.loads(path.read_text())
-    return _structure_dict(data, structure, out)
+    # The result may be shared with other generators, copy it before mutating
+    def load() -> dict:
+        data = orjson.loads((DATA / relative_path).read_bytes())
+        structured = _structure_dict(data, structure, out)
+        return _SharedDict(structured) if type(structured) is dict else structured
+
+    return shared(("json", relative_path, tuple(structure or ()), out), load)
 
 
 def load_csv(relative_path: str) -> pl.DataFrame:
-    return pl.read_csv(DATA / relative_path)
+    return shared(("csv", relative_path), lambda: pl.read_csv(DATA / relative_path))
 
 
 class AgeRange:
@@ -89,24 +133,23 @@ class AgeRangeDict(dict, t.Generic[T]):
         return super().__getitem__(key)
 
 
+# Samplers only read their tables, the random state comes from `get_rng`, which is
+# separate for every household stream and thread, so they can be shared without locks
 class Sampler(abc.ABC, t.Generic[T]):
     @abc.abstractmethod
     def sample(self) -> T:
         pass
 
+    def sample_many(self, size: int) -> list[T]:
+        return [self.sample() for _ in range(size)]
+
 
 @attr.define
 class BinomialSampler(Sampler):
     _probability: float
 
-    _rng: np.random.Generator = attr.field(init=False, factory=np.random.default_rng)
-    _lock: Lock = attr.field(init=False, factory=Lock)
-
     def sample(self) -> bool:
-        with self._lock:
-            value = self._rng.random()
-
-        return value < self._probability
+        return uniform() < self._probability
 
 
 @attr.define
@@ -114,16 +157,35 @@ class NormalSampler(Sampler):
     _loc: float
     _scale: float
 
-    _rng: np.random.Generator = attr.field(init=False, factory=np.random.default_rng)
-    _lock: Lock = attr.field(init=False, factory=Lock)
-
     @classmethod
     def from_dict(cls, data: dict[str, float]) -> t.Self:
         return cls(loc=data["loc"], scale=data["scale"])
 
     def sample(self) -> float:
-        with self._lock:
-            return self._rng.normal(loc=self._loc, scale=self._scale)
+        return self._loc + self._scale * standard_normal()
+
+
+def _alias_table(probabilities: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Vose's alias method, every column keeps its own value with probability
+    # `accept[i]` and gives way to `alias[i]` otherwise
+    size = len(probabilities)
+    scaled = probabilities / probabilities.sum() * size
+    accept = np.ones(size)
+    alias = np.arange(size)
+
+    small = [i for i, p in enumerate(scaled) if p < 1]
+    large = [i for i, p in enumerate(scaled) if p >= 1]
+
+    while small and large:
+        less, more = small.pop(), large.pop()
+        accept[less] = scaled[less]
+        alias[less] = more
+
+        scaled[more] += scaled[less] - 1
+        (small if scaled[more] < 1 else large).append(more)
+
+    # Whatever is left is 1 up to rounding errors
+    return accept, alias
 
 
 @attr.define
@@ -131,10 +193,11 @@ class MultinomialSampler(Sampler, t.Generic[T]):
     _values: list[T]
     _probabilities: np.ndarray
 
-    _indices: np.ndarray = attr.field(init=False)
-
-    _rng: np.random.Generator = attr.field(init=False, factory=np.random.default_rng)
-    _lock: Lock = attr.field(init=False, factory=Lock)
+    _accept: np.ndarray = attr.field(init=False)
+    _alias: np.ndarray = attr.field(init=False)
+    # Plain lists are faster to index with a single value than arrays
+    _accept_list: list[float] = attr.field(init=False)
+    _alias_values: list[T] = attr.field(init=False)
 
     @classmethod
     def from_dict(cls, data: dict[T, float]) -> t.Self:
@@ -142,13 +205,29 @@ class MultinomialSampler(Sampler, t.Generic[T]):
         return cls(values=list(values), probabilities=np.array(probabilities))
 
     def __attrs_post_init__(self) -> None:
-        self._indices = np.arange(len(self._values))
+        self._accept, self._alias = _alias_table(self._probabilities.astype(float))
+        self._accept_list = self._accept.tolist()
+        self._alias_values = [self._values[i] for i in self._alias]
 
     def sample(self) -> T:
-        with self._lock:
-            index = self._rng.choice(self._indices, p=self._probabilities)
+        column, threshold = divmod(uniform() * len(self._values), 1)
+        index = int(column)
 
-        return self._values[index]
+        if threshold < self._accept_list[index]:
+            return self._values[index]
+
+        return self._alias_values[index]
+
+    def sample_indices(self, size: int) -> np.ndarray:
+        scaled = get_rng().random(size) * len(self._values)
+        indices = scaled.astype(np.intp)
+        threshold = scaled - indices
+        return np.where(
+            threshold < self._accept[indices], indices, self._alias[indices]
+        )
+
+    def sample_many(self, size: int) -> list[T]:
+        return [self._values[index] for index in self.sample_indices(size)]
 
 
 @attr.define
@@ -161,6 +240,13 @@ class ConditionalSampler(t.Generic[T]):
         factory=list,
     )
 
+    # The nested dicts are flattened, every level maps its keys to integer codes and
+    # the leaf of a combination is at the sum of the codes times the level strides
+    _key_types: tuple[type, ...] = attr.field(init=False)
+    _codes: list[dict[t.Any, int]] = attr.field(init=False)
+    _strides: list[int] = attr.field(init=False)
+    _leaves: list[Sampler | None] = attr.field(init=False)
+
     def __attrs_post_init__(self) -> None:
         data = self._data
         while not isinstance(data, Sampler):
@@ -172,40 +258,185 @@ class ConditionalSampler(t.Generic[T]):
 
             self._hierarchy.append(key_type)
 
+        self._key_types = tuple(self._hierarchy)
+        self._codes = [{} for _ in self._hierarchy]
+        self._collect_codes(self._data, 0)
+
+        sizes = [len(codes) for codes in self._codes]
+        self._strides = [math.prod(sizes[level + 1 :]) for level in range(len(sizes))]
+        self._leaves = [None] * math.prod(sizes)
+        self._fill_leaves(self._data, 0, 0)
+
+    def _collect_codes(self, data: dict | Sampler, level: int) -> None:
+        if isinstance(data, Sampler):
+            return
+
+        codes = self._codes[level]
+        for key, value in data.items():
+            codes.setdefault(key, len(codes))
+            self._collect_codes(value, level + 1)
+
+    def _fill_leaves(self, data: dict | Sampler, level: int, offset: int) -> None:
+        if isinstance(data, Sampler):
+            self._leaves[offset] = data
+            return
+
+        codes, stride = self._codes[level], self._strides[level]
+        for key, value in data.items():
+            self._fill_leaves(value, level + 1, offset + codes[key] * stride)
+
     def sampler_for(self, *args: t.Any) -> Sampler:
-        params = {type(arg): arg for arg in args}
+        # Arguments in the order of the levels are used as they are, otherwise they
+        # are matched to the levels by their types
+        if tuple(map(type, args)) != self._key_types:
+            params = {type(arg): arg for arg in args}
+            args = tuple(params[feature_type] for feature_type in self._hierarchy)
 
-        data = self._data
-        for feature_type in self._hierarchy:
-            data = data[params[feature_type]]
+        index = 0
+        for codes, stride, arg in zip(self._codes, self._strides, args):
+            index += codes[arg] * stride
 
-        return data  # type: ignore[return-value]
+        if (sampler := self._leaves[index]) is None:
+            raise KeyError(args)
+
+        return sampler
 
     def sample(self, *args: t.Any, **kwargs: t.Any) -> T:
         return self.sampler_for(*args).sample(**kwargs)
 
+    def sample_many(self, *conditions: Sequence[t.Any]) -> list[T]:
+        # Rows with the same conditions are drawn at once from their leaf sampler
+        size = len(conditions[0])
+        if size == 0:
+            return []
+
+        if tuple(type(column[0]) for column in conditions) != self._key_types:
+            columns = {type(column[0]): column for column in conditions}
+            conditions = tuple(
+                columns[feature_type] for feature_type in self._hierarchy
+            )
+
+        indices = np.zeros(size, dtype=np.intp)
+        for codes, stride, column in zip(self._codes, self._strides, conditions):
+            indices += stride * np.fromiter(
+                (codes[value] for value in column), np.intp, size
+            )
+
+        order = np.argsort(indices, kind="stable")
+        groups, starts = np.unique(indices[order], return_index=True)
+
+        values: list[t.Any] = [None] * size
+        for index, rows in zip(groups, np.split(order, starts[1:])):
+            if (sampler := self._leaves[index]) is None:
+                raise KeyError(tuple(column[rows[0]] for column in conditions))
+
+            for row, value in zip(rows, sampler.sample_many(len(rows))):
+                values[row] = value
+
+        return values
+
+
+@attr.define
+class _FenwickTree:
+    # Prefix sums of counts that can be updated and searched in O(log n)
+    _tree: list[int]
+
+    @classmethod
+    def from_counts(cls, counts: Sequence[int]) -> t.Self:
+        tree = [0, *counts]
+
+        for i in range(1, len(tree)):
+            if (parent := i + (i & -i)) < len(tree):
+                tree[parent] += tree[i]
+
+        return cls(tree=tree)
+
+    def add(self, index: int, delta: int) -> None:
+        index += 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index: int) -> int:
+        # Sum of the counts before `index`
+        total = 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+
+        return total
+
+    def find(self, k: int) -> int:
+        # Index of the item that holds the k-th unit of the counts
+        index = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+
+        while step:
+            next_index = index + step
+
+            if next_index < len(self._tree) and self._tree[next_index] <= k:
+                index = next_index
+                k -= self._tree[index]
+
+            step >>= 1
+
+        return index
+
+
+@attr.define
+class _Buffer:
+    # Counts of the sorted distinct values of a dynamic sampler, so that the values
+    # in a range can be counted and drawn from without scanning them
+    counts: np.ndarray
+    tree: _FenwickTree
+
+    @classmethod
+    def from_counts(cls, counts: np.ndarray) -> t.Self:
+        return cls(counts=counts, tree=_FenwickTree.from_counts(counts.tolist()))
+
+    def add(self, position: int, delta: int) -> None:
+        self.counts[position] += delta
+        self.tree.add(position, delta)
+
 
 @attr.define
 class DynamicMultinomialSampler(Sampler, t.Generic[I]):
     _classic_sampler: MultinomialSampler[I]
 
-    _current: list[I] = attr.field(init=False)
     _buffer_size: int = attr.field(default=1000)
-    _resample_size: int = attr.field(default=200)
+
+    _values: list[I] = attr.field(init=False)
+    _values_array: np.ndarray = attr.field(init=False)
+    _probabilities: np.ndarray = attr.field(init=False)
+    _positions: dict[I, int] = attr.field(init=False)
+    # Positions of the values of the classic sampler among the sorted ones
+    _sorted_positions: np.ndarray = attr.field(init=False)
+
+    # Buffers are filled on the first draw, within a segment of the rng every one
+    # of them gets its own, seeded from the segment. Outside of segments every thread
+    # has a default one, so that the draws never have to wait for each other.
+    _default: local = attr.field(init=False, factory=local)
 
     _min_value: I = attr.field(init=False)
     _max_value: I = attr.field(init=False)
-    _replace_size: int = attr.field(init=False)
 
-    _rng: np.random.Generator = attr.field(init=False, factory=np.random.default_rng)
-    _lock: Lock = attr.field(init=False, factory=Lock)
+    # Draws with no buffered value in their range, which are made from the original
+    # distribution truncated to the range instead. Not locked, only a statistic.
+    truncated_draws: int = attr.field(init=False, default=0)
 
     def __attrs_post_init__(self) -> None:
-        self._current = [self._sample() for _ in range(self._buffer_size)]
+        order = sorted(
+            range(len(self._classic_sampler._values)),
+            key=self._classic_sampler._values.__getitem__,
+        )
+        self._values = [self._classic_sampler._values[i] for i in order]
+        self._values_array = np.array(self._values)
+        self._probabilities = self._classic_sampler._probabilities[order].astype(float)
+        self._positions = {value: i for i, value in enumerate(self._values)}
+        self._sorted_positions = np.argsort(order)
 
-        self._min_value = min(self._classic_sampler._values)
-        self._max_value = max(self._classic_sampler._values)
-        self._replace_size = self._buffer_size - self._resample_size
+        self._min_value = self._values[0]
+        self._max_value = self._values[-1]
 
     @classmethod
     def from_dict(cls, data: dict[I, float]) -> t.Self:
@@ -214,47 +445,65 @@ class DynamicMultinomialSampler(Sampler, t.Generic[I]):
     def _sample(self) -> I:
         return self._classic_sampler.sample()
 
-    def _resample_current(self) -> None:
-        self._current[self._replace_size :] = [
-            self._sample() for _ in range(self._resample_size)
-        ]
-
-    def _find_value(self, from_: int, to: int) -> tuple[int, I] | None:
-        return next(
-            (
-                (index, value)
-                for index, value in enumerate(self._current)
-                if from_ <= value <= to
-            ),
-            None,
+    def _fill(self, generator: np.random.Generator) -> _Buffer:
+        with stream(generator):
+            indices = self._classic_sampler.sample_indices(self._buffer_size)
+
+        counts = np.bincount(
+            self._sorted_positions[indices],
+            minlength=len(self._values),
         )
+        return _Buffer.from_counts(counts)
+
+    def _buffer(self) -> _Buffer:
+        if (buffer := segment_state(id(self), self._fill)) is not None:
+            return buffer
+
+        if (buffer := getattr(self._default, "buffer", None)) is None:
+            buffer = self._default.buffer = self._fill(get_rng())
+
+        return buffer
+
+    def _replace(self, buffer: _Buffer, position: int, value: I) -> None:
+        buffer.add(position, -1)
+        buffer.add(self._positions[value], 1)
+
+    def _range(self, from_: int, to: int) -> tuple[int, int]:
+        start = bisect.bisect_left(self._values, from_)
+        return start, bisect.bisect_right(self._values, to, lo=start)
+
+    @staticmethod
+    def _choose(weights: np.ndarray) -> int:
+        cumulative = np.cumsum(weights)
+        return int(np.searchsorted(cumulative, uniform() * cumulative[-1], "right"))
+
+    def _sample_truncated(self, from_: int, to: int, weights: np.ndarray) -> int:
+        if not weights.any():
+            raise ValueError(f"No values between {from_} and {to} can be drawn")
+
+        self.truncated_draws += 1
+        logger.debug("No buffered values between %s and %s (%s)", from_, to, id(self))
+
+        return self._choose(weights)
 
     def sample(self, from_: int | None = None, to: int | None = None) -> I:
         from_ = from_ or self._min_value
         to = to or self._max_value
         to_replace = self._sample()
 
-        with self._lock:
-            found = self._find_value(from_, to)
+        buffer = self._buffer()
+        start, stop = self._range(from_, to)
+        total = buffer.tree.prefix(stop) - buffer.tree.prefix(start)
 
-            while not found:
-                logger.warning(
-                    "Resampling buffer for (%s, %s) (%s)",
-                    from_,
-                    to,
-                    id(self),
-                )
-                self._resample_current()
-                found = self._find_value(from_, to)
+        if total == 0:
+            offset = self._sample_truncated(from_, to, self._probabilities[start:stop])
+            return self._values[start + offset]
 
-            index, value = found
-            self._current[index] = to_replace
+        k = buffer.tree.prefix(start) + int(uniform() * total)
+        position = buffer.tree.find(k)
+        self._replace(buffer, position, to_replace)
 
-        return value
-
-    @staticmethod
-    def _sort_by_value(t: tuple[int, I]) -> I:
-        return t[1]
+        return self._values[position]
 
     def sample_normal(
         self,
@@ -267,39 +516,104 @@ class DynamicMultinomialSampler(Sampler, t.Generic[I]):
         to = to or self._max_value
         to_replace = self._sample()
 
-        with self._lock:
-            index_value = [
-                (index, value)
-                for index, value in enumerate(self._current)
-                if from_ <= value <= to
-            ]
-            index_value.sort(key=self._sort_by_value)
+        buffer = self._buffer()
+        start, stop = self._range(from_, to)
+        counts = buffer.counts[start:stop]
+        buffered = counts.any()
 
-            indices, values = zip(*index_value)
-            values_np = np.array(values)
+        # Values weighted by the density of a normal distribution, unless it is too
+        # narrow for any of them
+        base = counts if buffered else self._probabilities[start:stop]
+        weights = base * np.exp(
+            -0.5 * ((self._values_array[start:stop] - mu) / sigma) ** 2
+        )
+        if not weights.any():
+            weights = base.astype(float)
 
-            # Approximate the probabilities from a normal distribution
-            probabilities = np.exp(-0.5 * ((values_np - mu) / sigma) ** 2) / (
-                sigma * np.sqrt(2 * np.pi)
-            )
-            probabilities = probabilities / probabilities.sum()
+        if not buffered:
+            return self._values[start + self._sample_truncated(from_, to, weights)]
 
-            index = self._rng.choice(indices, p=probabilities)
-            value = self._current[index]
-            self._current[index] = to_replace
+        position = start + self._choose(weights)
+        self._replace(buffer, position, to_replace)
 
-        return value
+        return self._values[position]
 
 
 @attr.define
 class DecisionTree(t.Generic[T]):
-    _classifier: DecisionTreeClassifier
-    _out: type[T]
+    # The nodes of a fitted `DecisionTreeClassifier` in plain arrays, leaves have
+    # a negative feature and the class with the highest count as their value
+    _feature: np.ndarray
+    _threshold: np.ndarray
+    _left: np.ndarray
+    _right: np.ndarray
+    _leaf_values: list[T]
+
+    # Lists are faster for walking the tree one value at a time
+    _feature_list: list[int] = attr.field(init=False)
+    _threshold_list: list[float] = attr.field(init=False)
+    _left_list: list[int] = attr.field(init=False)
+    _right_list: list[int] = attr.field(init=False)
+
+    def __attrs_post_init__(self) -> None:
+        self._feature_list = self._feature.tolist()
+        self._threshold_list = self._threshold.tolist()
+        self._left_list = self._left.tolist()
+        self._right_list = self._right.tolist()
+
+    @classmethod
+    def from_arrays(
+        cls,
+        arrays: dict[str, np.ndarray],
+        classes: Sequence,
+        out: type[T],
+    ) -> t.Self:
+        values = [out(c) for c in classes]  # type: ignore[call-arg]
+
+        return cls(
+            feature=np.array(arrays["feature"], dtype=np.intp),
+            threshold=np.array(arrays["threshold"], dtype=np.float64),
+            left=np.array(arrays["left"], dtype=np.intp),
+            right=np.array(arrays["right"], dtype=np.intp),
+            leaf_values=[values[i] for i in arrays["leaf_class"].tolist()],
+        )
+
+    @classmethod
+    def from_classifier(cls, classifier: t.Any, out: type[T]) -> t.Self:
+        return cls.from_arrays(tree_arrays(classifier), classifier.classes_, out)
 
     @classmethod
     def from_pickle(cls, relative_path: str, out: type[T]) -> t.Self:
+        # The bundle spares importing sklearn just to unpickle the classifier
+        bundle = _bundle()
+        if bundle is not None and (tree := bundle.load_tree(relative_path)) is not None:
+            return cls.from_arrays(*tree, out)
+
         path = DATA / relative_path
-        return cls(classifier=pickle.loads(path.read_bytes()), out=out)
+        return cls.from_classifier(pickle.loads(path.read_bytes()), out)
 
     def predict(self, *args: t.Any) -> T:
-        return self._out(self._classifier.predict(np.array([args]))[0])  # type: ignore[call-arg]
+        # sklearn compares the inputs converted to float32 with float64 thresholds
+        values = np.array(args, dtype=np.float32).tolist()
+        feature, threshold = self._feature_list, self._threshold_list
+        left, right = self._left_list, self._right_list
+
+        node = 0
+        while (index := feature[node]) >= 0:
+            node = left[node] if values[index] <= threshold[node] else right[node]
+
+        return self._leaf_values[node]
+
+    def predict_many(self, rows: t.Any) -> list[T]:
+        values = np.asarray(rows, dtype=np.float32).astype(np.float64)
+        nodes = np.zeros(len(values), dtype=np.intp)
+        active = np.flatnonzero(self._feature[nodes] >= 0)
+
+        while active.size:
+            current = nodes[active]
+            features = self._feature[current]
+            go_left = values[active, features] <= self._threshold[current]
+            nodes[active] = np.where(go_left, self._left[current], self._right[current])
+            active = active[self._feature[nodes[active]] >= 0]
+
+        return [self._leaf_values[node] for node in nodes]
@@ -18,10 +18,13 @@ def _iter_role(family: Family, role: Role) -> t.Iterator[Person]:
 
 class AgeSampler(Generator[Age]):
     def __init__(self) -> None:
-        data = load_json(
-            "wroclaw/census/age.json",
-            structure=[Sex],
-        )
+        data = {
+            sex: dict(dist)
+            for sex, dist in load_json(
+                "wroclaw/census/age.json",
+                structure=[Sex],
+            ).items()
+        }
 
         for dist in data.values():
             oldest = dist.pop("90+")
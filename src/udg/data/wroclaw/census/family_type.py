@@ -1,3 +1,5 @@
+from collections.abc import Sequence
+
 from udg.data.generator import Generator
 from udg.data.utils import MultinomialSampler, load_json
 from udg.features.family import FamilyType
@@ -18,3 +20,16 @@ class FamilyTypeSampler(Generator[FamilyType]):
             return FamilyType.NONE
 
         return self._sampler.sample()
+
+    def generate_batch(
+        self,
+        size: int,
+        household_structure: Sequence[HouseholdStructure],
+    ) -> list[FamilyType]:
+        return [
+            FamilyType.NONE if structure is HouseholdStructure.UNRELATED else sampled
+            for structure, sampled in zip(
+                household_structure,
+                self._sampler.sample_many(size),
+            )
+        ]
@@ -14,3 +14,6 @@ class HouseholdStructureSampler(Generator[HouseholdStructure]):
 
     def generate(self) -> HouseholdStructure:
         return self._sampler.sample()
+
+    def generate_batch(self, size: int) -> list[HouseholdStructure]:
+        return self._sampler.sample_many(size)
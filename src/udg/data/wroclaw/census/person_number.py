@@ -4,6 +4,8 @@ from udg.features.household import HouseholdStructure
 
 
 class PersonNumberSampler(Generator[PersonNumber]):
+    deterministic = True
+
     def __init__(self) -> None:
         self._single_adult_family_type = {
             FamilyType.MOTHER_WITH_CHILDREN,
@@ -1,3 +1,5 @@
+from collections.abc import Sequence
+
 from udg.data.generator import Generator
 from udg.data.utils import MultinomialSampler, load_json
 from udg.features.person import Role, Sex
@@ -17,3 +19,10 @@ class SexSampler(Generator[Sex]):
                 return Sex.M
             case _:
                 return self._sampler.sample()
+
+    def generate_batch(self, size: int, role: Sequence[Role]) -> list[Sex]:
+        sampled = self._sampler.sample_many(size)
+        return [
+            Sex.F if r is Role.MOTHER else Sex.M if r is Role.FATHER else sex
+            for r, sex in zip(role, sampled)
+        ]
@@ -1,13 +1,12 @@
-import random
-
 from udg.data.generator import Generator
+from udg.data.rng import get_rng
 from udg.data.utils import MultinomialSampler, load_json
 from udg.features.person import Age, Sex
 
 
 class AgeSexSampler(Generator[tuple[Age, Sex]]):
     def __init__(self) -> None:
-        data = load_json("wroclaw/unsorted/age_sex.json", out=dict)
+        data = dict(load_json("wroclaw/unsorted/age_sex.json"))
 
         missing = data.pop("0-5") / 2
         data["0-5_F"], data["0-5_M"] = missing, missing
@@ -23,4 +22,4 @@ class AgeSexSampler(Generator[tuple[Age, Sex]]):
 
     def generate(self) -> tuple[Age, Sex]:
         age_from, age_to, sex = self._sampler.sample()
-        return Age(random.randint(age_from, age_to)), sex
+        return Age(get_rng().integers(age_from, age_to + 1)), sex
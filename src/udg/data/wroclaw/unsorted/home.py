@@ -1,7 +1,6 @@
-import polars as pl
-
+from udg.data.facilities import FacilityIndex
 from udg.data.generator import Generator
-from udg.data.utils import MultinomialSampler, load_csv, load_json
+from udg.data.utils import MultinomialSampler, load_json
 from udg.features.household import Home
 from udg.types import Region
 
@@ -15,35 +14,12 @@ class HomeSampler(Generator[Home]):
             )
         )
 
-        self._facilities = load_csv("wroclaw/osm/facilities.csv")
-        self._tag_mapping = load_json(
-            "osm/tag_mappings.json",
-            structure=[str],
-            out=set,
-        )
-
-    def _region_to_place(self, region: Region, dest_type: str) -> Home:
-        tags = self._tag_mapping[dest_type]
-        filtered = self._facilities.filter(
-            pl.col("tag").is_in(tags) & (pl.col("region_id") == region)
-        )
-
-        if filtered.is_empty():
-            filtered = self._facilities.filter(pl.col("tag").is_in(tags))
-
-        id_, region_id, x, y = (
-            filtered.sample()
-            .select(
-                "id",
-                "region_id",
-                "x",
-                "y",
-            )
-            .row(0)
+        self._facilities = FacilityIndex.load(
+            "wroclaw/osm/facilities.csv",
+            load_json("osm/tag_mappings.json", structure=[str], out=set),
         )
 
-        return Home(id=id_, region=Region(region_id), x=x, y=y)
-
     def generate(self) -> Home:
         region = self._regions_sampler.sample()
-        return self._region_to_place(region, "home")
+        place = self._facilities.sample("home", region)
+        return Home(id=place.id, region=place.region, x=place.x, y=place.y)
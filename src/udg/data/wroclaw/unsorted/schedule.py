@@ -1,10 +1,13 @@
 import datetime as dt
 import enum
-import random
+import typing as t
+from collections.abc import Sequence
 
-import polars as pl
+import attr
 
+from udg.data.facilities import FacilityIndex
 from udg.data.generator import Generator
+from udg.data.rng import get_rng
 from udg.data.utils import (
     AgeRange,
     AgeRangeDict,
@@ -13,13 +16,12 @@ from udg.data.utils import (
     DecisionTree,
     MultinomialSampler,
     NormalSampler,
-    load_csv,
     load_json,
 )
 from udg.features.family import BikeNumber, CarNumber, PersonNumber
 from udg.features.household.home import Home
 from udg.features.person import Age, Schedule, Sex, TransportPreferences
-from udg.features.person.schedule import SetEndStop, SetLengthStop
+from udg.features.person.schedule import SetLengthStop
 from udg.types import Place, Region, Time, TransportMode
 
 
@@ -46,6 +48,14 @@ class DestinationType(enum.Enum):
         return str(self.value)
 
 
+@attr.frozen
+class _Leg:
+    start_time: Time
+    place: Place
+    duration: dt.timedelta
+    mode_input: tuple[float, ...]
+
+
 class ScheduleMaker(Generator[Schedule]):
     def __init__(self) -> None:
         self._any_travel = ConditionalSampler[bool](
@@ -125,37 +135,16 @@ class ScheduleMaker(Generator[Schedule]):
             }
         )
 
-        self._facilities = load_csv("wroclaw/osm/facilities.csv")
-        self._tag_mapping = load_json(
-            "osm/tag_mappings.json",
-            structure=[DestinationType],
-            out=set,
-        )
-
-    def _region_to_place(self, region: Region, dest_type: DestinationType) -> Place:
-        tags = self._tag_mapping[dest_type]
-        filtered = self._facilities.filter(
-            pl.col("tag").is_in(tags) & (pl.col("region_id") == region)
-        )
-
-        if filtered.is_empty():
-            # TODO: Is this really the correct approach? Isn't it better to take
-            # anything in the region?
-            filtered = self._facilities.filter(pl.col("tag").is_in(tags))
-
-        id_, region_id, x, y = (
-            filtered.sample()
-            .select(
-                "id",
-                "region_id",
-                "x",
-                "y",
-            )
-            .row(0)
+        self._facilities = FacilityIndex.load(
+            "wroclaw/osm/facilities.csv",
+            load_json(
+                "osm/tag_mappings.json",
+                structure=[DestinationType],
+                out=set,
+            ),
         )
-        return Place(id=id_, region=Region(region_id), x=x, y=y)
 
-    def generate(
+    def _plan_legs(
         self,
         person_number: PersonNumber,
         car_number: CarNumber,
@@ -164,15 +153,21 @@ class ScheduleMaker(Generator[Schedule]):
         sex: Sex,
         home: Home,
         transport_preferences: TransportPreferences,
-    ) -> Schedule:
+    ) -> list[_Leg]:
         if age <= 5:
-            return Schedule(stops=[])
+            return []
 
         if not self._any_travel.sample(age, sex):
-            return Schedule(stops=[])
-
-        stops: list[SetEndStop | SetLengthStop] = []
-        age_bracket = self._age_brackets[age]
+            return []
+
+        legs: list[_Leg] = []
+        person_input = (
+            *transport_preferences.as_input(),
+            person_number,
+            self._age_brackets[age],
+            car_number,
+            bike_number,
+        )
         dest_region = home.region
 
         first_dest_str, *travel_chain = self._travel_chains.sample(age, sex).split(",")
@@ -185,27 +180,22 @@ class ScheduleMaker(Generator[Schedule]):
         if not self._cancel_trip.sample(first_dest):
             start_time = Time(
                 hour=self._start_hour.sample(first_dest),
-                minute=random.randint(0, 59),
+                minute=get_rng().integers(0, 60),
             )
             spend_time = dt.timedelta(
                 minutes=round(self._spend_time.sample(age, sex, first_dest))
             )
             dest_region = self._gravities.sample(first_dest, home.region)
-            transport_mode = self._transport_modes.predict(
-                *transport_preferences.as_input(),
-                person_number,
-                age_bracket,
-                car_number,
-                bike_number,
-                self._distances[home.region][dest_region],
-            )
 
-            stops.append(
-                SetLengthStop(
+            legs.append(
+                _Leg(
                     start_time=start_time,
-                    place=self._region_to_place(dest_region, first_dest),
-                    transport_mode=transport_mode,
+                    place=self._facilities.sample(first_dest, dest_region),
                     duration=spend_time,
+                    mode_input=(
+                        *person_input,
+                        self._distances[home.region][dest_region],
+                    ),
                 )
             )
 
@@ -229,24 +219,87 @@ class ScheduleMaker(Generator[Schedule]):
                 if dest is not DestinationType.HOME
                 else home.region
             )
-            transport_mode = self._transport_modes.predict(
-                *transport_preferences.as_input(),
-                person_number,
-                age_bracket,
-                car_number,
-                bike_number,
-                self._distances[current_region][dest_region],
-            )
 
-            stops.append(
-                SetLengthStop(
+            legs.append(
+                _Leg(
                     start_time=start_time,
-                    place=self._region_to_place(dest_region, dest),
-                    transport_mode=transport_mode,
+                    place=self._facilities.sample(dest, dest_region),
                     duration=spend_time,
+                    mode_input=(
+                        *person_input,
+                        self._distances[current_region][dest_region],
+                    ),
                 )
             )
 
             current_region = dest_region
 
-        return Schedule(stops=stops)
+        return legs
+
+    def _make_schedule(
+        self,
+        legs: list[_Leg],
+        modes: t.Iterator[TransportMode],
+    ) -> Schedule:
+        return Schedule(
+            stops=[
+                SetLengthStop(
+                    start_time=leg.start_time,
+                    place=leg.place,
+                    transport_mode=next(modes),
+                    duration=leg.duration,
+                )
+                for leg in legs
+            ]
+        )
+
+    def generate(
+        self,
+        person_number: PersonNumber,
+        car_number: CarNumber,
+        bike_number: BikeNumber,
+        age: Age,
+        sex: Sex,
+        home: Home,
+        transport_preferences: TransportPreferences,
+    ) -> Schedule:
+        legs = self._plan_legs(
+            person_number,
+            car_number,
+            bike_number,
+            age,
+            sex,
+            home,
+            transport_preferences,
+        )
+        # A single person has too few legs for a vectorized prediction to pay off
+        modes = (self._transport_modes.predict(*leg.mode_input) for leg in legs)
+        return self._make_schedule(legs, modes)
+
+    def generate_batch(
+        self,
+        size: int,
+        person_number: Sequence[PersonNumber],
+        car_number: Sequence[CarNumber],
+        bike_number: Sequence[BikeNumber],
+        age: Sequence[Age],
+        sex: Sequence[Sex],
+        home: Sequence[Home],
+        transport_preferences: Sequence[TransportPreferences],
+    ) -> list[Schedule]:
+        plans = [
+            self._plan_legs(*person)
+            for person in zip(
+                person_number,
+                car_number,
+                bike_number,
+                age,
+                sex,
+                home,
+                transport_preferences,
+            )
+        ]
+        # The transport modes of all the legs in the batch are predicted at once
+        rows = [leg.mode_input for legs in plans for leg in legs]
+        modes = iter(self._transport_modes.predict_many(rows))
+        return [self._make_schedule(legs, modes) for legs in plans]
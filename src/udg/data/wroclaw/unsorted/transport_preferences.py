@@ -1,3 +1,5 @@
+from collections.abc import Sequence
+
 from udg.data.generator import Generator
 from udg.data.utils import AgeRange, ConditionalSampler, MultinomialSampler, load_json
 from udg.features.person import Age, Sex, TransportPreferences
@@ -49,3 +51,25 @@ class TransportPreferencesSampler(Generator[TransportPreferences]):
                 age, sex
             ),
         )
+
+    def generate_batch(
+        self,
+        size: int,
+        age: Sequence[Age],
+        sex: Sequence[Sex],
+    ) -> list[TransportPreferences]:
+        adults = [i for i in range(size) if age[i] > 5]
+        adult_age = [age[i] for i in adults]
+        adult_sex = [sex[i] for i in adults]
+
+        preferences = [TransportPreferences.for_child() for _ in range(size)]
+        for i, *values in zip(
+            adults,
+            self._pedestrian_inconvenience.sample_many(adult_age, adult_sex),
+            self._bicycle_comfort.sample_many(adult_age, adult_sex),
+            self._public_transport_comfort.sample_many(adult_age, adult_sex),
+            self._public_transport_punctuality.sample_many(adult_age, adult_sex),
+        ):
+            preferences[i] = TransportPreferences(*values)
+
+        return preferences
@@ -1,3 +1,5 @@
+from collections.abc import Sequence
+
 from udg.data.generator import Generator
 from udg.data.utils import ConditionalSampler, MultinomialSampler, load_json
 from udg.features.family import BikeNumber, ChildNumber, FamilyType
@@ -19,3 +21,11 @@ class BikeNumberSampler(Generator[BikeNumber]):
         child_number: ChildNumber,
     ) -> BikeNumber:
         return self._sampler.sample(family_type, child_number)
+
+    def generate_batch(
+        self,
+        size: int,
+        family_type: Sequence[FamilyType],
+        child_number: Sequence[ChildNumber],
+    ) -> list[BikeNumber]:
+        return self._sampler.sample_many(family_type, child_number)
@@ -1,3 +1,5 @@
+from collections.abc import Sequence
+
 from udg.data.generator import Generator
 from udg.data.utils import ConditionalSampler, MultinomialSampler, load_json
 from udg.features.family import CarNumber, ChildNumber, FamilyType
@@ -15,3 +17,11 @@ class CarNumberSampler(Generator[CarNumber]):
 
     def generate(self, family_type: FamilyType, child_number: ChildNumber) -> CarNumber:
         return self._sampler.sample(family_type, child_number)
+
+    def generate_batch(
+        self,
+        size: int,
+        family_type: Sequence[FamilyType],
+        child_number: Sequence[ChildNumber],
+    ) -> list[CarNumber]:
+        return self._sampler.sample_many(family_type, child_number)
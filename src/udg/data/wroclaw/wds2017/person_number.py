@@ -14,3 +14,6 @@ class PersonNumberSampler(Generator[PersonNumber]):
 
     def generate(self) -> PersonNumber:
         return self._sampler.sample()
+
+    def generate_batch(self, size: int) -> list[PersonNumber]:
+        return self._sampler.sample_many(size)
@@ -1,7 +1,7 @@
 import datetime as dt
-import random
 
 from udg.data.generator import Generator
+from udg.data.rng import get_rng
 from udg.features.family import CarNumber, PersonNumber
 from udg.features.household import FamilyNumber
 from udg.features.person import Age, Schedule, Sex
@@ -11,30 +11,36 @@ from udg.types import Place, Region, Time, TransportMode
 
 class FamilyNumberSampler(Generator[FamilyNumber]):
     def generate(self) -> FamilyNumber:
-        family_number = random.choice([1, 2, 3])
+        family_number = get_rng().integers(1, 4)
         return FamilyNumber(family_number)
 
+    def generate_batch(self, size: int) -> list[FamilyNumber]:
+        return [FamilyNumber(n) for n in get_rng().integers(1, 4, size=size)]
+
 
 class PersonNumberSampler(Generator[PersonNumber]):
     def generate(self) -> PersonNumber:
-        person_number = random.choice([1, 2, 3, 4, 5])
+        person_number = get_rng().integers(1, 6)
         return PersonNumber(person_number)
 
+    def generate_batch(self, size: int) -> list[PersonNumber]:
+        return [PersonNumber(n) for n in get_rng().integers(1, 6, size=size)]
+
 
 class CarNumberSampler(Generator[CarNumber]):
     def generate(self, person_number: PersonNumber) -> CarNumber:
         if person_number <= 1:
-            car_number = random.choice([0, 1])
+            car_number = get_rng().integers(0, 2)
         else:
-            car_number = random.choice([0, 1, 2])
+            car_number = get_rng().integers(0, 3)
 
         return CarNumber(car_number)
 
 
 class AgeSexSampler(Generator[tuple[Age, Sex]]):
     def generate(self) -> tuple[Age, Sex]:
-        age = random.randint(0, 100)
-        sex = random.choice(["M", "F"])
+        age = get_rng().integers(0, 101)
+        sex = ("M", "F")[get_rng().integers(0, 2)]
         return Age(age), Sex(sex)
 
 
@@ -1,67 +1,270 @@
+import contextlib
+import itertools
+import math
+import multiprocessing as mp
+import sys
 import typing as t
-from concurrent.futures import ThreadPoolExecutor
+from collections import ChainMap
+from collections.abc import Sequence
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
 
 import attr
-from tqdm import tqdm, trange
+import numpy as np
+from tqdm import tqdm
 
-from udg.features.base import Feature
-from udg.features.family import PersonNumber
-from udg.features.household import FamilyNumber
-from udg.model.definition import ModelDefinition
-from udg.model.model import Family, Household, Person, TrafficModel
+from udg.data import rng
+from udg.features.base import FamilyFeature, Feature, HouseholdFeature, PersonFeature
+from udg.model.definition import BuildPlan, ModelDefinition, Step
+from udg.model.memoization import memoize
+from udg.model.model import Deferred, Family, Household, Person, TrafficModel
+from udg.model.profiling import Profiler
 
-FeatureToBuild = t.TypeVar("FeatureToBuild", bound=Feature)
-Context: t.TypeAlias = dict[
-    type[Feature | Household | Family], Feature | Household | Family
-]
+ContextKey: t.TypeAlias = type[Feature | Household | Family]
+ContextValue: t.TypeAlias = Feature | Household | Family
+Columns: t.TypeAlias = dict[ContextKey, Sequence[t.Any]]
+
+_MISSING = object()
+
+
+class Context(ChainMap[ContextKey, ContextValue]):
+    # The household, family and person values are kept in separate layers, lookups
+    # fall through to the outer ones so nothing has to be copied for a new member
+    def __getitem__(self, key: ContextKey) -> ContextValue:
+        for mapping in self.maps:
+            if (value := mapping.get(key, _MISSING)) is not _MISSING:
+                return value  # type: ignore[return-value]
+
+        raise KeyError(key)
+
+    def push_layer(self) -> None:
+        self.maps.insert(0, {})
+
+    def pop_layer(self) -> None:
+        del self.maps[0]
+
+
+def _take(columns: Columns, indices: Sequence[int]) -> Columns:
+    return {cls: [column[i] for i in indices] for cls, column in columns.items()}
+
+
+def _waves(counts: Sequence[int]) -> t.Iterator[list[int]]:
+    # Yields the indices of the owners that need their n-th member in the n-th wave,
+    # so that members are still created one after another within a single owner.
+    for wave in range(max(counts, default=0)):
+        yield [i for i, count in enumerate(counts) if count > wave]
+
+
+# Households are built in segments of consecutive indices. State carried from one
+# household to the next, like the buffers of the dynamic samplers, starts over from
+# the seed of every segment, so the result does not depend on the number of workers.
+# The buffers need thousands of draws to keep the ages close to the census, so the
+# segments are long.
+HOUSEHOLDS_PER_SEGMENT = 4096
+
+# Workers build the segments in chunks, all the chunks of a segment go in order to
+# the same worker, which keeps the state of the segment between them
+HOUSEHOLDS_PER_CHUNK = 256
+
+# Chunks submitted to a worker and not finished yet
+CHUNKS_PER_WORKER = 2
+
+# Households that can be skipped in a row while trying to hit the person number exactly
+EXACT_MAX_SKIPPED = 10_000
+
+# Distinct arguments remembered for every deterministic generator
+CACHE_SIZE = 1024
+
+# Set once in every worker process by the pool initializer
+_worker_builder: "Builder | None" = None
+_worker_segments: dict[int, rng.Segment] = {}
+
+
+def _fork_context() -> mp.context.BaseContext:
+    # Forking hands the already initialized generators over to the workers, most of
+    # them cannot be pickled. It is not safe on macOS, where the system libraries
+    # are not guaranteed to work in a forked child.
+    if sys.platform == "darwin" or "fork" not in mp.get_all_start_methods():
+        raise RuntimeError(
+            f"Building in processes needs the 'fork' start method, which is not "
+            f"available on {sys.platform}, use threads instead"
+        )
+
+    return mp.get_context("fork")
+
+
+def _init_worker(builder: "Builder") -> None:
+    global _worker_builder
+    _worker_builder = builder
+
+
+def _build_chunk_in_process(
+    start: int,
+    stop: int,
+    root: np.random.SeedSequence,
+) -> list[Household]:
+    assert _worker_builder is not None
+    households = _worker_builder._build_chunk(_worker_segments, start, stop, root)
+
+    # Deferred features cannot be sent back to the main process
+    for household in households:
+        for family in household.families:
+            for person in family.persons:
+                person.resolve()
+
+    return households
 
 
 @attr.define
-class Builder:
-    model_definition: ModelDefinition
+class _Progress:
+    person_number: int
+    persons: int = 0
+    households: int = 0
 
-    def _build(
-        self,
-        cls: type[FeatureToBuild],
-        context: Context,
-    ) -> FeatureToBuild:
-        if (already_generated := context.get(cls)) is not None:
-            return t.cast(FeatureToBuild, already_generated)
+    def update(self, household: Household) -> None:
+        self.persons += sum(len(f.persons) for f in household.families)
+        self.households += 1
 
-        block = self.model_definition.building_blocks[cls]
+    def households_left(self) -> int:
+        # Nothing is known before the first household, a single chunk is built first
+        if self.persons == 0:
+            return HOUSEHOLDS_PER_CHUNK
 
-        requirements = {
-            name: self._build(requirement_cls, context)
-            for name, requirement_cls in block.requirements.items()
-        }
+        # Estimated from the persons per household seen so far
+        average = self.persons / self.households
+        return math.ceil((self.person_number - self.persons) / average)
 
-        generated_value = block.generator.generate(**requirements)
 
-        if isinstance(generated_value, tuple):
-            for value in generated_value:
-                context[type(value)] = value
+def _segment(
+    current: rng.Segment | None,
+    index: int,
+    root: np.random.SeedSequence,
+) -> rng.Segment:
+    # Segment of the household with the given index, the current one is kept until
+    # the index leaves it
+    if current is None or current.index != index // HOUSEHOLDS_PER_SEGMENT:
+        return rng.Segment.spawn(root, index // HOUSEHOLDS_PER_SEGMENT)
 
-            return t.cast(FeatureToBuild, context[cls])
+    return current
+
+
+def _shutdown(executors: Sequence[Executor]) -> None:
+    for executor in executors:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for executor in executors:
+        executor.shutdown()
+
+
+def _call(step: Step, arguments: Sequence[t.Any]) -> t.Any:
+    return (
+        step.generator.generate(*arguments)
+        if step.positional
+        else step.generator.generate(**dict(zip(step.names, arguments)))
+    )
+
+
+def _run(steps: Sequence[Step], context: Context) -> None:
+    for step in steps:
+        arguments = [context[cls] for cls in step.arguments]
+        generated_value = _call(step, arguments)
+
+        if len(step.features) == 1:
+            context[step.features[0]] = generated_value
         else:
-            context[cls] = generated_value
-            return generated_value
+            context.update(zip(step.features, generated_value))
+
+
+def _defer(step: Step, context: Context, generator: np.random.Generator) -> Deferred:
+    arguments = [context[cls] for cls in step.arguments]
+    # A segment of its own, so that the draws do not depend on the order the lazy
+    # features are accessed in and do not change the state of the household segment
+    sequence = t.cast(np.random.SeedSequence, generator.bit_generator.seed_seq)
+
+    def compute() -> dict[type[PersonFeature], PersonFeature]:
+        with rng.stream(generator, rng.Segment(0, sequence)):
+            generated_value = _call(step, arguments)
+
+        if len(step.features) == 1:
+            return {step.features[0]: generated_value}  # type: ignore[dict-item]
+        return dict(zip(step.features, generated_value))  # type: ignore[arg-type]
+
+    return Deferred(compute=compute)
+
+
+def _run_batch(steps: Sequence[Step], columns: Columns, size: int) -> None:
+    for step in steps:
+        generated_column = step.generator.generate_batch(
+            size,
+            **{name: columns[cls] for name, cls in zip(step.names, step.arguments)},
+        )
+
+        if len(step.features) == 1:
+            columns[step.features[0]] = generated_column
+        else:
+            columns.update(zip(step.features, zip(*generated_column)))
+
+
+@attr.define
+class Builder:
+    model_definition: ModelDefinition
+    profiler: Profiler | None = attr.field(default=None, kw_only=True)
+    cache_size: int = attr.field(default=CACHE_SIZE, kw_only=True)
+
+    _plan: BuildPlan = attr.field(init=False)
+
+    def __attrs_post_init__(self) -> None:
+        self._plan = self.model_definition.compile()
+
+        # Profiled first, so that the cache hits are not counted as generator calls
+        if self.profiler is not None:
+            self._plan = self.profiler.instrument(self._plan)
+
+        if self.cache_size > 0:
+            self._plan = memoize(self._plan, self.cache_size)
 
     def _build_person(self, context: Context) -> Person:
-        context = context.copy()
+        context.push_layer()
+        _run(self._plan.person, context)
+
+        deferred: dict[type[Feature], Deferred] = {}
+
+        # Spawned streams keep the draws of the lazy features independent from the
+        # ones that follow them and from the order they are accessed in
+        if self._plan.lazy:
+            for step, generator in zip(
+                self._plan.lazy,
+                rng.get_rng().spawn(len(self._plan.lazy)),
+            ):
+                deferred.update(
+                    dict.fromkeys(step.features, _defer(step, context, generator))
+                )
 
         person_features = {
-            feature: self._build(feature, context)
+            feature: (
+                deferred[feature]
+                if feature in deferred
+                else t.cast(PersonFeature, context[feature])
+            )
             for feature in self.model_definition.person_features
         }
 
+        context.pop_layer()
+
         return Person(features=person_features)
 
     def _build_family(self, context: Context) -> Family:
-        context = context.copy()
+        context.push_layer()
+        _run(self._plan.family, context)
 
-        person_number = self._build(PersonNumber, context)
         family_features = {
-            feature: self._build(feature, context)
+            feature: t.cast(FamilyFeature, context[feature])
             for feature in self.model_definition.family_features
         }
 
@@ -69,16 +272,65 @@ class Builder:
         family = Family(persons=persons, features=family_features)
 
         context[Family] = family
-        persons.extend(self._build_person(context) for _ in range(person_number))
+        persons.extend(self._build_person(context) for _ in range(family.person_number))
+        context.pop_layer()
 
         return family
 
-    def _build_household(self, *args: t.Any) -> Household:
-        context: Context = {}
+    def _build_household(
+        self,
+        index: int,
+        root: np.random.SeedSequence,
+        segment: rng.Segment,
+    ) -> Household:
+        # Every household draws from its own stream, so the result depends only on
+        # the root seed, the household index and the households before it in the
+        # segment and not on the order of building
+        with rng.stream(rng.spawn(root, index), segment):
+            return self._build_household_in_stream()
+
+    def _iter_range(
+        self,
+        indices: t.Iterable[int],
+        root: np.random.SeedSequence,
+    ) -> t.Generator[Household, None, None]:
+        # The indices have to start at the beginning of a segment
+        segment: rng.Segment | None = None
+
+        for index in indices:
+            segment = _segment(segment, index, root)
+            yield self._build_household(index, root, segment)
+
+    def _build_chunk(
+        self,
+        segments: dict[int, rng.Segment],
+        start: int,
+        stop: int,
+        root: np.random.SeedSequence,
+    ) -> list[Household]:
+        # Every worker has its own `segments`, the unfinished ones are kept there
+        # until their next chunk
+        index = start // HOUSEHOLDS_PER_SEGMENT
+        segment = (
+            segments.pop(index)
+            if start % HOUSEHOLDS_PER_SEGMENT
+            else rng.Segment.spawn(root, index)
+        )
+        households = [
+            self._build_household(i, root, segment) for i in range(start, stop)
+        ]
+
+        if stop % HOUSEHOLDS_PER_SEGMENT:
+            segments[index] = segment
+
+        return households
+
+    def _build_household_in_stream(self) -> Household:
+        context = Context()
+        _run(self._plan.household, context)
 
-        family_number = self._build(FamilyNumber, context)
         household_features = {
-            feature: self._build(feature, context)
+            feature: t.cast(HouseholdFeature, context[feature])
             for feature in self.model_definition.household_features
         }
 
@@ -86,80 +338,476 @@ class Builder:
         household = Household(families=families, features=household_features)
 
         context[Household] = household
-        families.extend(self._build_family(context) for _ in range(family_number))
+        families.extend(
+            self._build_family(context) for _ in range(household.family_number)
+        )
 
         return household
 
-    def build_model(
+    def _build_persons_batch(
+        self,
+        families: list[Family],
+        family_columns: Columns,
+    ) -> None:
+        person_numbers = [family.person_number for family in families]
+
+        for members in _waves(person_numbers):
+            columns = _take(family_columns, members)
+            # Lazy features are generated right away, whole columns are cheap enough
+            _run_batch(self._plan.person + self._plan.lazy, columns, len(members))
+
+            person_features = {
+                feature: columns[feature]
+                for feature in self.model_definition.person_features
+            }
+
+            for i, family_index in enumerate(members):
+                families[family_index].persons.append(
+                    Person(
+                        features={
+                            feature: column[i]
+                            for feature, column in person_features.items()
+                        }
+                    )
+                )
+
+    def _build_families_batch(
         self,
+        households: list[Household],
+        household_columns: Columns,
+    ) -> tuple[list[Family], Columns]:
+        families: list[Family] = []
+        family_columns: dict[type[Feature | Household | Family], list[t.Any]] = {}
+        family_numbers = [household.family_number for household in households]
+
+        for members in _waves(family_numbers):
+            columns = _take(household_columns, members)
+            _run_batch(self._plan.family, columns, len(members))
+
+            family_features = {
+                feature: columns[feature]
+                for feature in self.model_definition.family_features
+            }
+
+            wave_families = [
+                Family(
+                    persons=[],
+                    features={
+                        feature: column[i]
+                        for feature, column in family_features.items()
+                    },
+                )
+                for i in range(len(members))
+            ]
+            for household_index, family in zip(members, wave_families):
+                households[household_index].families.append(family)
+
+            families.extend(wave_families)
+            columns[Family] = wave_families
+
+            for cls, column in columns.items():
+                family_columns.setdefault(cls, []).extend(column)
+
+        return families, {cls: column for cls, column in family_columns.items()}
+
+    def _build_batch(
+        self,
+        start: int,
         household_number: int,
-        enable_tqdm: bool = False,
-    ) -> TrafficModel:
+        root: np.random.SeedSequence,
+        segment: rng.Segment,
+    ) -> list[Household]:
+        # Columns are sampled at once, so the whole batch shares the stream and the
+        # segment of its first household
+        with rng.stream(rng.spawn(root, start), segment):
+            return self._build_batch_in_stream(household_number)
+
+    def _build_batch_in_stream(self, household_number: int) -> list[Household]:
+        columns: Columns = {}
+        _run_batch(self._plan.household, columns, household_number)
+
+        household_features = {
+            feature: columns[feature]
+            for feature in self.model_definition.household_features
+        }
+
         households = [
-            self._build_household()
-            for _ in trange(
-                household_number,
-                disable=not enable_tqdm,
+            Household(
+                families=[],
+                features={
+                    feature: column[i] for feature, column in household_features.items()
+                },
             )
+            for i in range(household_number)
         ]
-        return TrafficModel(households=households)
+        columns[Household] = households
 
-    def _build_until(self, person_number: int, pbar: tqdm) -> list[Household]:
-        households: list[Household] = []
-        current = 0
+        families, family_columns = self._build_families_batch(households, columns)
+        self._build_persons_batch(families, family_columns)
 
-        while True:
-            household = self._build_household()
-            households.append(household)
-            persons = sum(len(f.persons) for f in household.families)
-            current += persons
+        return households
 
-            pbar.update(persons)
+    def _regenerate_household(
+        self,
+        household: Household,
+        plan: BuildPlan,
+        index: int,
+        root: np.random.SeedSequence,
+        segment: rng.Segment,
+    ) -> None:
+        def run(steps: Sequence[Step], context: Context, features: dict) -> None:
+            _run(steps, context)
+            features.update(
+                (feature, context[feature])
+                for step in steps
+                for feature in step.features
+            )
+
+        # Generators taking the whole Household or Family see only the families and
+        # persons built before the current one, so the lists are refilled as they go
+        with rng.stream(rng.spawn(root, index), segment):
+            context = Context()
+            context.update(household.features.items())
+            run(plan.household, context, household.features)
+            context[Household] = household
+
+            families = list(household.families)
+            household.families.clear()
+
+            try:
+                for family in families:
+                    context.push_layer()
+                    context.update(family.features.items())
+                    run(plan.family, context, family.features)
+                    context[Family] = family
+
+                    persons = list(family.persons)
+                    family.persons.clear()
+
+                    try:
+                        for person in persons:
+                            context.push_layer()
+                            context.update(person.resolve().items())
+                            run(plan.person + plan.lazy, context, person.features)
+                            context.pop_layer()
+                            family.persons.append(person)
+                    finally:
+                        family.persons[:] = persons
+
+                    context.pop_layer()
+                    household.families.append(family)
+            finally:
+                household.families[:] = families
+
+    def _iter_in_workers(
+        self,
+        submit: t.Callable[[int, int, int], Future[list[Household]]],
+        workers: int,
+        total: float,
+        window: t.Callable[[], int] | None = None,
+    ) -> t.Generator[Household, None, None]:
+        # The next `workers` segments are built at once, each of them by its own
+        # worker. Chunks are submitted only up to the households estimated to be
+        # still needed and get shorter as the target gets close, so little is built
+        # in vain when it is reached.
+        pending: dict[int, Future[list[Household]]] = {}
+        next_starts: dict[int, int] = {}
+        position = 0
+
+        def submit_chunks() -> None:
+            horizon = position + (window() if window is not None else total)
+            horizon = min(max(horizon, position + 1), total)
+            first = position // HOUSEHOLDS_PER_SEGMENT
+
+            for segment in range(first, first + workers):
+                end = (segment + 1) * HOUSEHOLDS_PER_SEGMENT
+                start = next_starts.get(segment, segment * HOUSEHOLDS_PER_SEGMENT)
+                running = sum(
+                    not future.done()
+                    for chunk, future in pending.items()
+                    if chunk // HOUSEHOLDS_PER_SEGMENT == segment
+                )
+
+                while running < CHUNKS_PER_WORKER and start < min(horizon, end):
+                    stop = int(min(start + HOUSEHOLDS_PER_CHUNK, end, horizon))
+                    pending[start] = submit(segment % workers, start, stop)
+                    start = stop
+                    running += 1
+
+                next_starts[segment] = start
+
+        while position < total:
+            submit_chunks()
+            future = pending[position]
+
+            while not future.done():
+                wait(
+                    [future for future in pending.values() if not future.done()],
+                    return_when=FIRST_COMPLETED,
+                )
+                submit_chunks()
+
+            households = pending.pop(position).result()
+            position += len(households)
+
+            if position % HOUSEHOLDS_PER_SEGMENT == 0:
+                del next_starts[position // HOUSEHOLDS_PER_SEGMENT - 1]
+
+            yield from households
+
+    def _iter_in_processes(
+        self,
+        processes: int,
+        root: np.random.SeedSequence,
+        total: float,
+        window: t.Callable[[], int] | None = None,
+    ) -> t.Generator[Household, None, None]:
+        # A pool per process, so that the chunks of a segment go to the same one
+        context = _fork_context()
+        executors = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self,),
+            )
+            for _ in range(processes)
+        ]
 
-            if current >= person_number:
-                break
+        def submit(worker: int, start: int, stop: int) -> Future[list[Household]]:
+            return executors[worker].submit(_build_chunk_in_process, start, stop, root)
 
-        return households
+        try:
+            yield from self._iter_in_workers(submit, processes, total, window)
+        finally:
+            _shutdown(executors)
 
-    def _build_until_threaded(
+    def _iter_in_threads(
+        self,
+        threads: int,
+        root: np.random.SeedSequence,
+        total: float,
+        window: t.Callable[[], int] | None = None,
+    ) -> t.Generator[Household, None, None]:
+        executors = [ThreadPoolExecutor(max_workers=1) for _ in range(threads)]
+        segments: list[dict[int, rng.Segment]] = [{} for _ in range(threads)]
+
+        def submit(worker: int, start: int, stop: int) -> Future[list[Household]]:
+            return executors[worker].submit(
+                self._build_chunk, segments[worker], start, stop, root
+            )
+
+        try:
+            yield from self._iter_in_workers(submit, threads, total, window)
+        finally:
+            _shutdown(executors)
+
+    def iter_households(
+        self,
+        household_number: int,
+        threads: int = 0,
+        processes: int = 0,
+        seed: rng.Seed = None,
+    ) -> t.Iterator[Household]:
+        if threads > 0 and processes > 0:
+            raise ValueError("Cannot use both threads and processes")
+
+        root = rng.seed_sequence(seed)
+
+        if processes > 0:
+            yield from self._iter_in_processes(processes, root, household_number)
+        elif threads > 0:
+            yield from self._iter_in_threads(threads, root, household_number)
+        else:
+            yield from self._iter_range(range(household_number), root)
+
+    def iter_households_until(
         self,
-        executor: ThreadPoolExecutor,
         person_number: int,
-        pbar: tqdm,
-    ) -> list[Household]:
-        households: list[Household] = []
-        current = 0
+        threads: int = 0,
+        processes: int = 0,
+        seed: rng.Seed = None,
+        exact: bool = False,
+    ) -> t.Iterator[Household]:
+        if threads > 0 and processes > 0:
+            raise ValueError("Cannot use both threads and processes")
+
+        root = rng.seed_sequence(seed)
+        progress = _Progress(person_number)
+        households: t.Generator[Household, None, None]
+
+        if processes > 0:
+            households = self._iter_in_processes(
+                processes,
+                root,
+                math.inf,
+                window=progress.households_left,
+            )
+        elif threads > 0:
+            households = self._iter_in_threads(
+                threads,
+                root,
+                math.inf,
+                window=progress.households_left,
+            )
+        else:
+            households = self._iter_range(itertools.count(), root)
 
-        for household in executor.map(
-            self._build_household, (() for _ in range(person_number))
-        ):
-            households.append(household)
-            persons = sum(len(f.persons) for f in household.families)
-            current += persons
+        with contextlib.closing(households):
+            skipped = 0
 
-            pbar.update(persons)
+            for household in households:
+                persons = sum(len(f.persons) for f in household.families)
 
-            if current >= person_number:
-                break
+                # Skip households that do not fit instead of overshooting the target
+                if exact and progress.persons + persons > person_number:
+                    skipped += 1
 
-        executor.shutdown(wait=False, cancel_futures=True)
-        return households
+                    if skipped > EXACT_MAX_SKIPPED:
+                        raise RuntimeError(
+                            f"Could not build exactly {person_number} persons, "
+                            f"no household fits the remaining "
+                            f"{person_number - progress.persons}"
+                        )
+
+                    continue
+
+                skipped = 0
+                progress.update(household)
+                yield household
+
+                if progress.persons >= person_number:
+                    break
+
+    def iter_regenerated(
+        self,
+        households: t.Iterable[Household],
+        features: t.Iterable[type[Feature]],
+        seed: rng.Seed = None,
+    ) -> t.Iterator[Household]:
+        # Only the features that depend on the given ones are generated again, the
+        # households are updated in place
+        plan = self._plan.affected_by(features)
+        root = rng.seed_sequence(seed)
+
+        segment: rng.Segment | None = None
+
+        for index, household in enumerate(households):
+            segment = _segment(segment, index, root)
+            self._regenerate_household(household, plan, index, root, segment)
+            yield household
+
+    def regenerate(
+        self,
+        model: TrafficModel,
+        features: t.Iterable[type[Feature]],
+        enable_tqdm: bool = False,
+        seed: rng.Seed = None,
+    ) -> TrafficModel:
+        households = self.iter_regenerated(model.households, features, seed=seed)
+
+        for _ in tqdm(households, total=model.household_count, disable=not enable_tqdm):
+            pass
+
+        return model
+
+    def build_model(
+        self,
+        household_number: int,
+        enable_tqdm: bool = False,
+        threads: int = 0,
+        processes: int = 0,
+        seed: rng.Seed = None,
+    ) -> TrafficModel:
+        households = self.iter_households(
+            household_number,
+            threads=threads,
+            processes=processes,
+            seed=seed,
+        )
+
+        return TrafficModel(
+            households=list(
+                tqdm(households, total=household_number, disable=not enable_tqdm)
+            )
+        )
 
     def build_model_until(
         self,
         person_number: int,
         threads: int = 0,
         enable_tqdm: bool = False,
+        processes: int = 0,
+        seed: rng.Seed = None,
+        exact: bool = False,
     ) -> TrafficModel:
+        households: list[Household] = []
+
         with tqdm(total=person_number, disable=not enable_tqdm) as pbar:
-            if threads > 0:
-                with ThreadPoolExecutor(max_workers=threads) as executor:
-                    households = self._build_until_threaded(
-                        executor,
-                        person_number,
-                        pbar,
-                    )
-            else:
-                households = self._build_until(person_number, pbar)
+            for household in self.iter_households_until(
+                person_number,
+                threads=threads,
+                processes=processes,
+                seed=seed,
+                exact=exact,
+            ):
+                households.append(household)
+                pbar.update(sum(len(f.persons) for f in household.families))
+
+        return TrafficModel(households=households)
+
+    def build_model_batched(
+        self,
+        household_number: int,
+        batch_size: int = 10_000,
+        enable_tqdm: bool = False,
+        seed: rng.Seed = None,
+    ) -> TrafficModel:
+        root = rng.seed_sequence(seed)
+        households: list[Household] = []
+        segment: rng.Segment | None = None
+
+        with tqdm(total=household_number, disable=not enable_tqdm) as pbar:
+            while len(households) < household_number:
+                size = min(batch_size, household_number - len(households))
+                segment = _segment(segment, len(households), root)
+                households.extend(
+                    self._build_batch(len(households), size, root, segment)
+                )
+                pbar.update(size)
+
+        return TrafficModel(households=households)
+
+    def build_model_until_batched(
+        self,
+        person_number: int,
+        batch_size: int = 10_000,
+        enable_tqdm: bool = False,
+        seed: rng.Seed = None,
+    ) -> TrafficModel:
+        root = rng.seed_sequence(seed)
+        households: list[Household] = []
+        segment: rng.Segment | None = None
+        current = 0
+
+        with tqdm(total=person_number, disable=not enable_tqdm) as pbar:
+            while current < person_number:
+                # Use the persons per household seen so far to avoid building
+                # a whole batch when only a few households are missing
+                average = current / len(households) if current > 0 else 1
+                size = min(batch_size, math.ceil((person_number - current) / average))
+                segment = _segment(segment, len(households), root)
+
+                for household in self._build_batch(
+                    len(households), size, root, segment
+                ):
+                    households.append(household)
+                    persons = sum(len(f.persons) for f in household.families)
+                    current += persons
+
+                    pbar.update(persons)
+
+                    if current >= person_number:
+                        break
 
         return TrafficModel(households=households)
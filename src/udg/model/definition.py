@@ -30,24 +30,95 @@ class InvalidFeatureError(ModelDefinitionError):
     pass
 
 
+class CyclicDependencyError(ModelDefinitionError):
+    pass
+
+
 @attr.frozen
 class Block:
     generator: Generator
     requirements: Mapping[str, type[Feature]]
 
 
+@attr.frozen
+class Step:
+    generator: Generator
+    names: tuple[str, ...]
+    arguments: tuple[type[Feature | Household | Family], ...]
+    features: tuple[type[Feature], ...]
+    # Keyword-only parameters rule out passing the arguments positionally
+    positional: bool
+    # Deterministic generators whose arguments are all of hashable types, households
+    # and families are left out anyway as they are mutated while being built
+    memoizable: bool
+
+
+@attr.frozen
+class BuildPlan:
+    household: tuple[Step, ...]
+    family: tuple[Step, ...]
+    person: tuple[Step, ...]
+    # Person features that are generated only when accessed
+    lazy: tuple[Step, ...] = ()
+
+    def affected_by(self, features: t.Iterable[type[Feature]]) -> "BuildPlan":
+        requested = set(features)
+        affected: set[type] = set()
+
+        # Steps come after the steps of their requirements, so a single pass finds
+        # all the dependents. Generators that take the whole Household or Family may
+        # look at any of its features, so they are affected by anything regenerated
+        # before them.
+        def select(steps: Sequence[Step]) -> tuple[Step, ...]:
+            selected = []
+
+            for step in steps:
+                if (
+                    requested.intersection(step.features)
+                    or affected.intersection(step.arguments)
+                    or (affected and {Household, Family}.intersection(step.arguments))
+                ):
+                    selected.append(step)
+                    affected.update(step.features)
+
+            return tuple(selected)
+
+        plan = BuildPlan(
+            household=select(self.household),
+            family=select(self.family),
+            person=select(self.person),
+            lazy=select(self.lazy),
+        )
+
+        if structural := {FamilyNumber, PersonNumber}.intersection(affected):
+            raise InvalidFeatureError(
+                f"'{next(iter(structural)).__name__}' defines the structure of "
+                "the model and cannot be regenerated"
+            )
+
+        return plan
+
+
 @attr.frozen
 class ModelDefinition:
     building_blocks: Mapping[type[Feature], Block]
     household_features: Sequence[type[HouseholdFeature]]
     family_features: Sequence[type[FamilyFeature]]
     person_features: Sequence[type[PersonFeature]]
+    lazy_features: frozenset[type[PersonFeature]] = attr.field(
+        default=frozenset(),
+        kw_only=True,
+    )
 
     def __attrs_post_init__(self) -> None:
         self.validate()
 
     @classmethod
-    def from_generators(cls, *generators: Generator) -> t.Self:
+    def from_generators(
+        cls,
+        *generators: Generator,
+        lazy_features: t.Iterable[type[PersonFeature]] = (),
+    ) -> t.Self:
         building_blocks: dict[type[Feature], Block] = {}
         household_features: list[type[HouseholdFeature]] = []
         family_features: list[type[FamilyFeature]] = []
@@ -86,7 +157,114 @@ class ModelDefinition:
             household_features=tuple(household_features),
             family_features=tuple(family_features),
             person_features=tuple(person_features),
+            lazy_features=frozenset(lazy_features),
+        )
+
+    def _plan_step(self, feature: type[Feature]) -> Step:
+        block = self.building_blocks[feature]
+        signature = inspect.signature(block.generator.generate)
+        arguments = tuple(block.requirements.values())
+
+        return Step(
+            generator=block.generator,
+            names=tuple(block.requirements),
+            arguments=arguments,
+            features=tuple(_discover_return_types(signature.return_annotation)),
+            positional=all(
+                parameter.kind is not inspect.Parameter.KEYWORD_ONLY
+                for parameter in signature.parameters.values()
+            ),
+            memoizable=block.generator.deterministic
+            and not {Household, Family}.intersection(arguments)
+            and all(cls.__hash__ is not None for cls in arguments),
+        )
+
+    def _plan_level(
+        self,
+        level: str,
+        features: Sequence[type[Feature]],
+        available: set[type[Feature | Household | Family]],
+    ) -> tuple[Step, ...]:
+        steps: list[Step] = []
+        visiting: list[type[Feature]] = []
+
+        def visit(feature: type[Feature]) -> None:
+            if feature in available:
+                return
+
+            if (
+                feature is Household  # type: ignore[comparison-overlap]
+                or feature is Family  # type: ignore[comparison-overlap]
+            ):
+                raise InvalidFeatureError(
+                    f"'{visiting[-1].__name__}' requires '{feature.__name__}', "
+                    f"which is not available when building the {level} features"
+                )
+
+            if feature in visiting:
+                cycle = " -> ".join(f.__name__ for f in (*visiting, feature))
+                raise CyclicDependencyError(f"Found a dependency cycle: {cycle}")
+
+            visiting.append(feature)
+            for requirement in self.building_blocks[feature].requirements.values():
+                visit(requirement)
+            visiting.pop()
+
+            step = self._plan_step(feature)
+            steps.append(step)
+            available.update(step.features)
+
+        for feature in features:
+            visit(feature)
+
+        return tuple(steps)
+
+    def compile(self) -> BuildPlan:
+        # Every level can use the features planned for the levels above it
+        available: set[type[Feature | Household | Family]] = set()
+
+        household = self._plan_level(
+            "household",
+            (FamilyNumber, *self.household_features),
+            available,
         )
+        available.add(Household)
+
+        family = self._plan_level(
+            "family",
+            (PersonNumber, *self.family_features),
+            available,
+        )
+        available.add(Family)
+
+        person = self._plan_level(
+            "person",
+            [f for f in self.person_features if f not in self.lazy_features],
+            available,
+        )
+
+        for step in person:
+            if eager := self.lazy_features.intersection(step.features):
+                raise InvalidFeatureError(
+                    f"Lazy feature '{next(iter(eager)).__name__}' is required by "
+                    "a feature that is not lazy"
+                )
+
+        lazy = self._plan_level(
+            "person",
+            [f for f in self.person_features if f in self.lazy_features],
+            available,
+        )
+
+        for step in lazy:
+            if required := self.lazy_features.intersection(step.arguments):
+                raise InvalidFeatureError(
+                    f"Lazy feature '{step.features[0].__name__}' requires "
+                    f"'{next(iter(required)).__name__}', lazy features can only depend "
+                    "on features that are not lazy"
+                )
+
+        return BuildPlan(household=household, family=family, person=person, lazy=lazy)
 
     def validate(self) -> None:
         requirements = {
@@ -139,6 +317,13 @@ class ModelDefinition:
                 )
                 for feature in overlapping
             ),
+            *(
+                InvalidFeatureError(
+                    f"Lazy feature '{feature.__name__}' is not a person feature"
+                )
+                for feature in self.lazy_features
+                if feature not in self.person_features
+            ),
         ]
 
         if exceptions:
@@ -0,0 +1,56 @@
+import functools
+import typing as t
+from collections.abc import Sequence
+
+import attr
+
+from udg.data.generator import Generator
+from udg.model.definition import BuildPlan, Step
+
+
+@attr.define
+class _MemoizedGenerator(Generator):
+    _generator: Generator
+    _maxsize: int
+
+    _cached: t.Callable = attr.field(init=False)
+
+    def __attrs_post_init__(self) -> None:
+        # `lru_cache` is thread safe and keeps the keyword arguments in the key
+        self._cached = functools.lru_cache(maxsize=self._maxsize)(
+            self._generator.generate
+        )
+
+    def generate(self, *args, **kwargs) -> t.Any:
+        return self._cached(*args, **kwargs)
+
+    # Whole columns are not cached, vectorized generators are faster on their own
+    def generate_batch(self, size: int, *args, **kwargs) -> Sequence[t.Any]:
+        return self._generator.generate_batch(size, *args, **kwargs)
+
+    def cache_info(self) -> functools._CacheInfo:
+        return self._cached.cache_info()  # type: ignore[attr-defined]
+
+
+def memoize(plan: BuildPlan, maxsize: int) -> BuildPlan:
+    def memoize_steps(steps: Sequence[Step]) -> tuple[Step, ...]:
+        return tuple(
+            (
+                attr.evolve(
+                    step,
+                    generator=_MemoizedGenerator(
+                        generator=step.generator, maxsize=maxsize
+                    ),
+                )
+                if step.memoizable
+                else step
+            )
+            for step in steps
+        )
+
+    return BuildPlan(
+        household=memoize_steps(plan.household),
+        family=memoize_steps(plan.family),
+        person=memoize_steps(plan.person),
+        lazy=memoize_steps(plan.lazy),
+    )
@@ -14,31 +14,59 @@ from udg.utils import generate_id
 from ..serialization import feature_dicts
 
 
+@attr.define
+class Deferred:
+    # Stands in for the features of a lazy generator until one of them is accessed,
+    # all the features of the generator are computed at once
+    _compute: t.Callable[[], dict[type[PersonFeature], PersonFeature]]
+    _values: dict[type[PersonFeature], PersonFeature] | None = None
+
+    def get(self, feature: type[PersonFeature]) -> PersonFeature:
+        if self._values is None:
+            self._values = self._compute()
+
+        return self._values[feature]
+
+
 @attr.define
 class Person:
     id: str = attr.field(factory=generate_id, kw_only=True)
-    features: dict[type[PersonFeature], PersonFeature]
+    features: dict[type[PersonFeature], PersonFeature | Deferred]
 
     @property
     def schedule(self) -> Schedule:
-        return t.cast(Schedule, self.features[Schedule])
+        return t.cast(Schedule, self.feature(Schedule))
+
+    def feature(self, feature: type[PersonFeature]) -> PersonFeature:
+        value = self.features[feature]
+
+        if isinstance(value, Deferred):
+            value = self.features[feature] = value.get(feature)
+
+        return value
+
+    def resolve(self) -> dict[type[PersonFeature], PersonFeature]:
+        for feature in self.features:
+            self.feature(feature)
+
+        return self.features  # type: ignore[return-value]
 
     @classmethod
     def from_dict(cls, data: dict) -> t.Self:
         return cls(
             id=data["id"],
-            features=feature_dicts.deserialize(data["features"]),
+            features=dict(feature_dicts.deserialize(data["features"])),
         )
 
     def to_dict(self) -> dict:
         return {
             "id": self.id,
-            "features": feature_dicts.serialize(self.features),
+            "features": feature_dicts.serialize(self.resolve()),
         }
 
     def to_matsim_xml(self) -> ET.Element:
         person = ET.Element("person", id=self.id)
-        features = self.features.copy()
+        features = self.resolve().copy()
         schedule: Schedule = features.pop(Schedule)  # type: ignore[assignment]
 
         attributes = ET.SubElement(person, "attributes")
@@ -0,0 +1,191 @@
+import functools
+import threading
+import time
+import typing as t
+from collections.abc import Sequence
+from types import TracebackType
+
+import attr
+import orjson
+
+from udg.data.generator import Generator
+from udg.data.utils import DecisionTree, Sampler
+from udg.model.definition import BuildPlan, Step
+
+Hook: t.TypeAlias = t.Callable[["GeneratorStats", float, float], None]
+
+_SAMPLER_METHODS = (
+    "sample",
+    "sample_many",
+    "sample_normal",
+    "predict",
+    "predict_many",
+)
+
+
+@attr.define
+class GeneratorStats:
+    name: str
+    calls: int = 0
+    values: int = 0
+    total_time: float = 0.0
+    sampler_calls: int = 0
+    sampler_time: float = 0.0
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.values if self.values else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "values": self.values,
+            "total_time": self.total_time,
+            "mean_time": self.mean_time,
+            "sampler_calls": self.sampler_calls,
+            "sampler_time": self.sampler_time,
+        }
+
+
+@attr.define
+class _Call:
+    sampler_calls: int = 0
+    sampler_time: float = 0.0
+    depth: int = 0
+
+
+def _subclasses(cls: type) -> t.Iterator[type]:
+    subclass: type
+
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from _subclasses(subclass)
+
+
+@attr.define
+class Profiler:
+    hooks: list[Hook] = attr.field(factory=list)
+
+    _stats: dict[int, GeneratorStats] = attr.field(init=False, factory=dict)
+    _local: threading.local = attr.field(init=False, factory=threading.local)
+    _lock: threading.Lock = attr.field(init=False, factory=threading.Lock)
+    _patched: list[tuple[type, str, t.Callable]] = attr.field(init=False, factory=list)
+
+    # Sampler time is only measured while the profiler is entered, because the
+    # sampler classes have to be patched for that.
+    def __enter__(self) -> t.Self:
+        for cls in (*_subclasses(Sampler), DecisionTree):
+            for name in _SAMPLER_METHODS:
+                if (method := vars(cls).get(name)) is not None:
+                    self._patched.append((cls, name, method))
+                    setattr(cls, name, self._time_sampler(method))
+
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        for cls, name, method in reversed(self._patched):
+            setattr(cls, name, method)
+
+        self._patched.clear()
+
+    def _time_sampler(self, method: t.Callable) -> t.Callable:
+        @functools.wraps(method)
+        def timed(*args: t.Any, **kwargs: t.Any) -> t.Any:
+            call: _Call | None = getattr(self._local, "call", None)
+
+            # Samplers calling other samplers are only counted once
+            if call is None or call.depth > 0:
+                return method(*args, **kwargs)
+
+            call.depth += 1
+            start = time.perf_counter()
+
+            try:
+                return method(*args, **kwargs)
+            finally:
+                call.sampler_time += time.perf_counter() - start
+                call.sampler_calls += 1
+                call.depth -= 1
+
+        return timed
+
+    def _record(self, stats: GeneratorStats, values: int, start: float) -> None:
+        elapsed = time.perf_counter() - start
+        call: _Call = self._local.call
+        self._local.call = None
+
+        with self._lock:
+            stats.calls += 1
+            stats.values += values
+            stats.total_time += elapsed
+            stats.sampler_calls += call.sampler_calls
+            stats.sampler_time += call.sampler_time
+
+        for hook in self.hooks:
+            hook(stats, elapsed, call.sampler_time)
+
+    def _stats_for(self, generator: Generator) -> GeneratorStats:
+        cls = type(generator)
+        return self._stats.setdefault(
+            id(generator),
+            GeneratorStats(name=f"{cls.__module__}.{cls.__qualname__}"),
+        )
+
+    def instrument(self, plan: BuildPlan) -> BuildPlan:
+        def instrument_steps(steps: Sequence[Step]) -> tuple[Step, ...]:
+            return tuple(
+                attr.evolve(
+                    step,
+                    generator=_ProfiledGenerator(
+                        generator=step.generator,
+                        profiler=self,
+                        stats=self._stats_for(step.generator),
+                    ),
+                )
+                for step in steps
+            )
+
+        return BuildPlan(
+            household=instrument_steps(plan.household),
+            family=instrument_steps(plan.family),
+            person=instrument_steps(plan.person),
+            lazy=instrument_steps(plan.lazy),
+        )
+
+    def report(self) -> dict[str, dict]:
+        with self._lock:
+            stats = sorted(self._stats.values(), key=lambda s: -s.total_time)
+            return {s.name: s.to_dict() for s in stats}
+
+    def to_json(self) -> str:
+        return orjson.dumps(self.report(), option=orjson.OPT_INDENT_2).decode()
+
+
+@attr.define
+class _ProfiledGenerator(Generator):
+    _generator: Generator
+    _profiler: Profiler
+    _stats: GeneratorStats
+
+    def generate(self, *args, **kwargs) -> t.Any:
+        self._profiler._local.call = _Call()
+        start = time.perf_counter()
+
+        try:
+            return self._generator.generate(*args, **kwargs)
+        finally:
+            self._profiler._record(self._stats, 1, start)
+
+    def generate_batch(self, size: int, *args, **kwargs) -> Sequence[t.Any]:
+        self._profiler._local.call = _Call()
+        start = time.perf_counter()
+
+        try:
+            return self._generator.generate_batch(size, *args, **kwargs)
+        finally:
+            self._profiler._record(self._stats, size, start)
@@ -0,0 +1,166 @@
+import abc
+import contextlib
+import typing as t
+from collections import Counter
+from enum import Enum
+from pathlib import Path
+from types import TracebackType
+from xml.etree import ElementTree as ET
+
+import attr
+import orjson
+
+from udg.features.base import Feature
+from udg.model.model import Household
+from udg.utils import generate_id
+
+
+class Sink(abc.ABC):
+    def __enter__(self) -> t.Self:
+        self.open()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    # Optional hooks for sinks holding a resource, they do nothing by default
+    def open(self) -> None:  # noqa: B027
+        pass
+
+    @abc.abstractmethod
+    def write(self, household: Household) -> None:
+        pass
+
+    def close(self) -> None:  # noqa: B027
+        pass
+
+
+@attr.define
+class JsonSink(Sink):
+    # Writes the same document as `TrafficModel.to_dict`, one household at a time
+    path: Path
+    model_id: str = attr.field(factory=generate_id, kw_only=True)
+
+    _file: t.BinaryIO | None = attr.field(init=False, default=None)
+    _first: bool = attr.field(init=False, default=True)
+
+    def open(self) -> None:
+        self._file = self.path.open("wb")
+        self._file.write(b'{"id":' + orjson.dumps(self.model_id) + b',"households":[')
+        self._first = True
+
+    def write(self, household: Household) -> None:
+        assert self._file is not None
+
+        if not self._first:
+            self._file.write(b",")
+
+        # One household per line, so that the file can be read back in a stream
+        self._file.write(b"\n" + orjson.dumps(household.to_dict()))
+        self._first = False
+
+    def close(self) -> None:
+        assert self._file is not None
+
+        self._file.write(b"\n]}")
+        self._file.close()
+        self._file = None
+
+
+def iter_json_households(path: Path) -> t.Iterator[Household]:
+    # Reads the households of a `JsonSink` file one at a time, other JSON documents
+    # with a model are loaded at once
+    with path.open("rb") as file:
+        header = file.readline()
+
+        if not header.endswith(b'"households":[\n'):
+            data = orjson.loads(header + file.read())
+            yield from (Household.from_dict(d) for d in data["households"])
+            return
+
+        for line in file:
+            if line != b"]}":
+                yield Household.from_dict(orjson.loads(line.rstrip(b",\n")))
+
+
+@attr.define
+class MatsimXmlSink(Sink):
+    # Writes the same population as `TrafficModel.to_matsim_xml`
+    path: Path
+
+    _file: t.BinaryIO | None = attr.field(init=False, default=None)
+
+    def open(self) -> None:
+        self._file = self.path.open("wb")
+        self._file.write(b"<?xml version='1.0' encoding='utf-8'?>\n<population>\n")
+
+    def write(self, household: Household) -> None:
+        assert self._file is not None
+
+        for person in household.to_matsim_xml():
+            ET.indent(person, level=1)
+            self._file.write(b"  " + ET.tostring(person, encoding="utf-8"))
+            self._file.write(b"\n")
+
+    def close(self) -> None:
+        assert self._file is not None
+
+        self._file.write(b"</population>")
+        self._file.close()
+        self._file = None
+
+
+@attr.define
+class StatisticsSink(Sink):
+    household_count: int = attr.field(init=False, default=0)
+    family_count: int = attr.field(init=False, default=0)
+    person_count: int = attr.field(init=False, default=0)
+
+    # Value counts of the features with a small number of possible values, lazy
+    # features that were not accessed yet are not counted
+    feature_counts: dict[str, Counter] = attr.field(init=False, factory=dict)
+
+    def _count(self, features: t.Iterable[tuple[type[Feature], object]]) -> None:
+        for feature_type, value in features:
+            if isinstance(value, Enum | int):
+                counter = self.feature_counts.setdefault(
+                    feature_type.__name__, Counter()
+                )
+                counter[str(value)] += 1
+
+    def write(self, household: Household) -> None:
+        self.household_count += 1
+        self._count(household.features.items())
+
+        for family in household.families:
+            self.family_count += 1
+            self._count(family.features.items())
+
+            for person in family.persons:
+                self.person_count += 1
+                self._count(person.features.items())
+
+    def to_dict(self) -> dict:
+        return {
+            "household_count": self.household_count,
+            "family_count": self.family_count,
+            "person_count": self.person_count,
+            "feature_counts": {
+                name: dict(counter) for name, counter in self.feature_counts.items()
+            },
+        }
+
+
+def consume(households: t.Iterable[Household], *sinks: Sink) -> None:
+    with contextlib.ExitStack() as stack:
+        for sink in sinks:
+            stack.enter_context(sink)
+
+        for household in households:
+            for sink in sinks:
+                sink.write(household)
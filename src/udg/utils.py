@@ -6,6 +6,7 @@ from types import ModuleType
 import base58
 
 from udg.data.generator import Generator
+from udg.data.rng import get_rng
 
 
 def _is_generator(obj: object) -> bool:
@@ -23,4 +24,7 @@ def collect_generators(module: ModuleType) -> t.Iterator[type[Generator]]:
 
 
 def generate_id() -> str:
-    return base58.b58encode(uuid.uuid4().bytes).decode()
+    # Drawn from the current stream, so that ids are reproducible as well
+    bit_generator = get_rng().bit_generator
+    value = int(bit_generator.random_raw()) << 64 | int(bit_generator.random_raw())
+    return base58.b58encode(uuid.UUID(int=value, version=4).bytes).decode()
@@ -0,0 +1,53 @@
+import datetime as dt
+
+import pytest
+
+from udg import Builder, Generator, ModelDefinition
+from udg.data import wroclaw
+from udg.data.rng import get_rng
+from udg.features.person import Age, Schedule
+from udg.features.person.schedule import SetLengthStop
+from udg.types import Place, Region, Time, TransportMode
+from udg.utils import collect_generators
+
+
+class StubScheduleMaker(Generator[Schedule]):
+    # `z_palca.ScheduleMaker` uses stops that cannot be exported to MATSim
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def generate(self, age: Age) -> Schedule:
+        self.calls += 1
+        stop = SetLengthStop(
+            start_time=Time(hour=int(get_rng().integers(0, 24))),
+            place=Place(id=f"work_{age}", region=Region(1), x=age, y=1),
+            transport_mode=TransportMode.CAR,
+            duration=dt.timedelta(hours=1),
+        )
+        return Schedule(stops=[stop])
+
+
+def make_builder(
+    *generators: Generator,
+    schedule_maker: Generator[Schedule] | None = None,
+    lazy_features: tuple[type, ...] = (),
+) -> Builder:
+    # The z_palca generators, or the given ones, with a stub schedule maker
+    if not generators:
+        generators = tuple(
+            cls()
+            for cls in collect_generators(wroclaw.z_palca)
+            if cls is not wroclaw.z_palca.ScheduleMaker
+        )
+
+    definition = ModelDefinition.from_generators(
+        *generators,
+        schedule_maker or StubScheduleMaker(),
+        lazy_features=lazy_features,
+    )
+    return Builder(definition)
+
+
+@pytest.fixture(scope="module")
+def builder() -> Builder:
+    return make_builder()
@@ -0,0 +1,230 @@
+import multiprocessing as mp
+import sys
+import typing as t
+
+import numpy as np
+import pytest
+
+from tests.conftest import make_builder
+from udg import Builder, ModelDefinition
+from udg.data import rng, wroclaw
+from udg.data.utils import load_json
+from udg.features.person import Age, Sex
+from udg.model import builder as builder_module
+from udg.model.builder import Context
+from udg.model.model import TrafficModel
+from udg.utils import collect_generators
+
+FORK = sys.platform != "darwin" and "fork" in mp.get_all_start_methods()
+requires_fork = pytest.mark.skipif(not FORK, reason="processes are forked")
+
+
+@pytest.fixture(scope="module")
+def builder() -> Builder:
+    generators = (cls() for cls in collect_generators(wroclaw.z_palca))
+    return Builder(ModelDefinition.from_generators(*generators))
+
+
+def _assert_consistent(model: TrafficModel) -> None:
+    for household in model.households:
+        assert len(household.families) == household.family_number
+
+        for family in household.families:
+            assert len(family.persons) == family.person_number
+
+
+def test_build_model_batched(builder: Builder) -> None:
+    model = builder.build_model_batched(household_number=250, batch_size=100)
+
+    assert model.household_count == 250
+    _assert_consistent(model)
+
+
+def test_build_model_until_batched(builder: Builder) -> None:
+    model = builder.build_model_until_batched(person_number=500, batch_size=64)
+    last_household_persons = sum(
+        family.person_number for family in model.households[-1].families
+    )
+
+    assert 500 <= model.person_count < 500 + last_household_persons
+    _assert_consistent(model)
+
+
+def test_build_model_batched_segments(
+    builder: Builder,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(builder_module, "HOUSEHOLDS_PER_SEGMENT", 128)
+    spawned: list[int] = []
+    spawn = rng.Segment.spawn
+
+    def record(root: np.random.SeedSequence, index: int) -> rng.Segment:
+        spawned.append(index)
+        return spawn(root, index)
+
+    monkeypatch.setattr(rng.Segment, "spawn", record)
+    first = builder.build_model_batched(household_number=300, batch_size=50, seed=2)
+
+    # Batches starting in the same segment share it
+    assert spawned == [0, 1]
+    second = builder.build_model_batched(household_number=300, batch_size=50, seed=2)
+    assert first.to_dict()["households"] == second.to_dict()["households"]
+
+
+def _features(model: TrafficModel) -> list:
+    return [
+        [
+            [person.features for person in family.persons]
+            for family in household.families
+        ]
+        for household in model.households
+    ]
+
+
+@requires_fork
+def test_build_model_until_processes_is_reproducible(builder: Builder) -> None:
+    first = builder.build_model_until(person_number=300, processes=2, seed=42)
+    second = builder.build_model_until(person_number=300, processes=2, seed=42)
+
+    assert first.person_count >= 300
+    assert _features(first) == _features(second)
+    _assert_consistent(first)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"threads": 1},
+        {"threads": 3},
+        pytest.param({"processes": 2}, marks=requires_fork),
+    ],
+)
+def test_build_model_until_does_not_depend_on_workers(
+    builder: Builder,
+    kwargs: dict,
+) -> None:
+    sequential = builder.build_model_until(person_number=500, seed=7)
+    parallel = builder.build_model_until(person_number=500, seed=7, **kwargs)
+
+    assert parallel.to_dict()["households"] == sequential.to_dict()["households"]
+
+
+def test_census_model_does_not_depend_on_workers(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # The age sampler carries its buffer over from one household to the next,
+    # smaller segments and chunks spread the model over all the workers
+    monkeypatch.setattr(builder_module, "HOUSEHOLDS_PER_SEGMENT", 128)
+    monkeypatch.setattr(builder_module, "HOUSEHOLDS_PER_CHUNK", 32)
+
+    def build(**kwargs: t.Any) -> list:
+        generators = (cls() for cls in collect_generators(wroclaw.census))
+        model = make_builder(*generators).build_model_until(1000, seed=7, **kwargs)
+        return model.to_dict()["households"]
+
+    sequential = build()
+
+    assert build() == sequential
+    assert build(threads=4) == sequential
+
+    if FORK:
+        assert build(processes=2) == sequential
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"threads": 2}, pytest.param({"processes": 2}, marks=requires_fork)],
+)
+def test_build_model_until_workers_build_little_in_vain(
+    builder: Builder,
+    monkeypatch: pytest.MonkeyPatch,
+    kwargs: dict,
+) -> None:
+    submitted: list[int] = []
+    iter_in_workers = Builder._iter_in_workers
+
+    def record(self: Builder, submit: t.Callable, *args: t.Any) -> t.Iterator:
+        def recorded(worker: int, start: int, stop: int) -> t.Any:
+            submitted.append(stop - start)
+            return submit(worker, start, stop)
+
+        return iter_in_workers(self, recorded, *args)
+
+    monkeypatch.setattr(Builder, "_iter_in_workers", record)
+    model = builder.build_model_until(person_number=5000, seed=3, **kwargs)
+
+    assert model.household_count <= sum(submitted) < model.household_count * 1.1
+
+
+def test_census_ages() -> None:
+    generators = (cls() for cls in collect_generators(wroclaw.census))
+    model = make_builder(*generators).build_model_until(10_000, seed=1)
+    persons = [
+        person
+        for household in model.households
+        for family in household.families
+        for person in family.persons
+    ]
+    bins = [0, 10, 20, 25, 30, 40, 50, 60, 70, 80, 200]
+
+    expected = np.zeros(len(bins) - 1)
+    census = load_json("wroclaw/census/age.json", structure=[Sex])
+    for sex, distribution in census.items():
+        share = sum(person.features[Sex] is sex for person in persons) / len(persons)
+        total = sum(distribution.values())
+
+        for age, probability in distribution.items():
+            age_bin = np.searchsorted(bins, int(age.rstrip("+")), side="right") - 1
+            expected[age_bin] += share * probability / total
+
+    ages = [t.cast(int, person.features[Age]) for person in persons]
+    shares = np.histogram(ages, bins)[0] / len(ages)
+
+    # The buffers of the age sampler keep the ranged draws close to the census,
+    # without them the error is around 0.25
+    assert np.abs(shares - expected).sum() < 0.18
+
+
+def test_processes_need_fork(
+    builder: Builder,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(mp, "get_all_start_methods", lambda: ["spawn"])
+
+    with pytest.raises(RuntimeError, match="'fork' start method"):
+        builder.build_model(household_number=10, processes=2)
+
+
+@requires_fork
+def test_build_model_processes(builder: Builder) -> None:
+    model = builder.build_model(household_number=50, processes=2, seed=1)
+
+    assert model.household_count == 50
+    _assert_consistent(model)
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"threads": 2}])
+def test_build_model_until_exact(builder: Builder, kwargs: dict) -> None:
+    model = builder.build_model_until(person_number=777, seed=5, exact=True, **kwargs)
+
+    assert model.person_count == 777
+    _assert_consistent(model)
+
+
+def test_context_layers() -> None:
+    context = Context()
+    context[Age] = Age(40)
+
+    context.push_layer()
+    context[Sex] = Sex.F
+    context[Age] = Age(10)
+
+    assert context[Age] == Age(10)
+    assert context[Sex] is Sex.F
+
+    context.pop_layer()
+
+    assert context[Age] == Age(40)
+    assert Sex not in context
+    with pytest.raises(KeyError):
+        context[Sex]
@@ -0,0 +1,48 @@
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from udg.data.bundle import Bundle, build_bundle
+from udg.data.utils import DATA, DecisionTree
+from udg.types import TransportMode
+
+TREE = "wroclaw/kbr/transport_mode.pkl"
+
+
+def _bundle(tmp_path: Path) -> tuple[Path, Bundle]:
+    data = tmp_path / "data"
+    (data / TREE).parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(DATA / TREE, data / TREE)
+
+    build_bundle(data, data / "bundle")
+    bundle = Bundle.open(data, data / "bundle")
+    assert bundle is not None
+    return data, bundle
+
+
+def test_bundle_tree(tmp_path: Path) -> None:
+    _, bundle = _bundle(tmp_path)
+    tree = bundle.load_tree(TREE)
+    assert tree is not None
+
+    bundled = DecisionTree.from_arrays(*tree, out=TransportMode)
+    pickled = DecisionTree.from_pickle(TREE, TransportMode)
+    rows = np.random.default_rng(0).integers(0, 6, size=(1000, 9))
+
+    assert bundled.predict_many(rows) == pickled.predict_many(rows)
+
+
+def test_bundle_ignores_changed_sources(tmp_path: Path) -> None:
+    data, bundle = _bundle(tmp_path)
+    path = data / TREE
+
+    # Checkouts do not keep the modification times
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert bundle.load_tree(TREE) is not None
+
+    with path.open("ab") as file:
+        file.write(b"\0")
+    assert bundle.load_tree(TREE) is None
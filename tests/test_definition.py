@@ -0,0 +1,58 @@
+import pytest
+
+from udg import Generator, ModelDefinition
+from udg.data import wroclaw
+from udg.features.family import CarNumber, PersonNumber
+from udg.features.household import FamilyNumber
+from udg.features.person import Age, Schedule, Sex
+from udg.model.definition import CyclicDependencyError, InvalidFeatureError
+from udg.model.model import Family
+from udg.utils import collect_generators
+
+
+def test_compile_orders_steps_by_level() -> None:
+    generators = (cls() for cls in collect_generators(wroclaw.z_palca))
+    plan = ModelDefinition.from_generators(*generators).compile()
+
+    assert [step.features for step in plan.household] == [(FamilyNumber,)]
+    assert [step.features for step in plan.family] == [(PersonNumber,), (CarNumber,)]
+    assert [step.features for step in plan.person] == [(Age, Sex), (Schedule,)]
+    assert plan.person[1].arguments == (Age, Sex)
+
+
+def test_compile_detects_cycles() -> None:
+    class CyclicPersonNumberSampler(Generator[PersonNumber]):
+        def generate(self, car_number: CarNumber) -> PersonNumber:
+            return PersonNumber(1)
+
+    generators = [
+        cls()
+        for cls in collect_generators(wroclaw.z_palca)
+        if cls is not wroclaw.z_palca.PersonNumberSampler
+    ]
+    definition = ModelDefinition.from_generators(
+        *generators,
+        CyclicPersonNumberSampler(),
+    )
+
+    with pytest.raises(CyclicDependencyError):
+        definition.compile()
+
+
+def test_compile_rejects_unavailable_family() -> None:
+    class FamilyCarNumberSampler(Generator[CarNumber]):
+        def generate(self, family: Family) -> CarNumber:
+            return CarNumber(len(family.persons))
+
+    generators = [
+        cls()
+        for cls in collect_generators(wroclaw.z_palca)
+        if cls is not wroclaw.z_palca.CarNumberSampler
+    ]
+    definition = ModelDefinition.from_generators(
+        *generators,
+        FamilyCarNumberSampler(),
+    )
+
+    with pytest.raises(InvalidFeatureError):
+        definition.compile()
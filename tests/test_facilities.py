@@ -0,0 +1,68 @@
+import pickle
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from udg.data import rng
+from udg.data.facilities import Facilities, FacilityIndex, write_store
+from udg.types import Place, Region
+
+FACILITIES = pl.DataFrame(
+    {
+        "id": ["a", "b", "c", "d", "e", "f"],
+        "tag": ["house", "school", "apartments", "house", None, "apartments"],
+        "region_id": [1, 1, 2, 1, 2, 3],
+        "x": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+        "y": [6.0, 5.0, 4.0, 3.0, 2.0, 1.0],
+    }
+)
+TAG_MAPPING = {"home": {"house", "apartments"}, "school": {"school"}}
+
+
+def test_facility_index_rows() -> None:
+    index = FacilityIndex.from_frame(FACILITIES, TAG_MAPPING)
+
+    assert index.rows_for("home", Region(1)).tolist() == [0, 3]
+    assert index.rows_for("home", Region(2)).tolist() == [2]
+    assert index.rows_for("school", Region(1)).tolist() == [1]
+    # No school in the region, any school in the city is used
+    assert index.rows_for("school", Region(3)).tolist() == [1]
+
+
+def test_facility_index_sample() -> None:
+    index = FacilityIndex.from_frame(FACILITIES, TAG_MAPPING)
+    rng.seed(0)
+
+    places = [index.sample("home", Region(1)) for _ in range(100)]
+
+    assert {place.id for place in places} == {"a", "d"}
+    assert index.place(2) == Place(id="c", region=Region(2), x=3.0, y=4.0)
+
+
+def test_facilities_store(tmp_path: Path) -> None:
+    frame = FACILITIES.with_columns(
+        category=pl.lit("building"), name=pl.Series([None, "School", *[None] * 4])
+    )
+    write_store(frame, tmp_path / "facilities")
+    facilities = Facilities.open(tmp_path / "facilities")
+
+    assert isinstance(facilities.xs, np.memmap)
+    assert [facilities.place(row) for row in range(len(frame))] == [
+        Facilities.from_frame(FACILITIES).place(row) for row in range(len(frame))
+    ]
+
+    index = FacilityIndex.from_facilities(facilities, TAG_MAPPING)
+    assert index.rows_for("home", Region(1)).tolist() == [0, 3]
+
+
+def test_facilities_store_is_pickled_as_path(tmp_path: Path) -> None:
+    write_store(FACILITIES, tmp_path / "facilities")
+    facilities = Facilities.open(tmp_path / "facilities")
+
+    data = pickle.dumps(facilities)
+    assert len(data) < 1000
+
+    unpickled = pickle.loads(data)
+    assert isinstance(unpickled.ids, np.memmap)
+    assert unpickled.place(5) == facilities.place(5)
@@ -0,0 +1,93 @@
+import datetime as dt
+
+import pytest
+
+from tests.conftest import StubScheduleMaker, make_builder
+from udg import Builder, ModelDefinition
+from udg.data import wroclaw
+from udg.data.utils import DynamicMultinomialSampler
+from udg.features.person import Age, Schedule
+from udg.features.person.schedule import SetLengthStop
+from udg.model.definition import InvalidFeatureError
+from udg.model.model import Deferred, TrafficModel
+from udg.types import Place, Region, Time, TransportMode
+from udg.utils import collect_generators
+
+
+class BufferedScheduleMaker(StubScheduleMaker):
+    # Draws the start from a dynamic sampler, which keeps a buffer in the rng segment
+    def __init__(self) -> None:
+        super().__init__()
+        self._hours = DynamicMultinomialSampler.from_dict(
+            {hour: 1.0 for hour in range(24)}
+        )
+
+    def generate(self, age: Age) -> Schedule:
+        self.calls += 1
+        stop = SetLengthStop(
+            start_time=Time(hour=self._hours.sample(from_=6, to=18)),
+            place=Place(id=f"work_{age}", region=Region(1), x=age, y=1),
+            transport_mode=TransportMode.CAR,
+            duration=dt.timedelta(hours=1),
+        )
+        return Schedule(stops=[stop])
+
+
+def _builder(lazy: bool) -> tuple[Builder, StubScheduleMaker]:
+    schedule_maker = StubScheduleMaker()
+    builder = make_builder(
+        schedule_maker=schedule_maker,
+        lazy_features=(Schedule,) if lazy else (),
+    )
+    return builder, schedule_maker
+
+
+def _persons(model: TrafficModel) -> list:
+    return [
+        person
+        for household in model.households
+        for family in household.families
+        for person in family.persons
+    ]
+
+
+def test_lazy_features_are_generated_on_access() -> None:
+    builder, schedule_maker = _builder(lazy=True)
+    persons = _persons(builder.build_model(household_number=20, seed=0))
+
+    assert schedule_maker.calls == 0
+    assert all(isinstance(person.features[Schedule], Deferred) for person in persons)
+
+    assert persons[0].schedule is persons[0].schedule
+    assert schedule_maker.calls == 1
+
+
+def test_lazy_features_match_in_any_access_order() -> None:
+    builder, _ = _builder(lazy=True)
+
+    first = _persons(builder.build_model(household_number=20, seed=0))
+    second = _persons(builder.build_model(household_number=20, seed=0))
+
+    schedules = [person.schedule for person in first]
+    assert schedules == [person.schedule for person in reversed(second)][::-1]
+
+
+def test_buffered_lazy_features_match_in_any_access_order() -> None:
+    builder = make_builder(
+        schedule_maker=BufferedScheduleMaker(),
+        lazy_features=(Schedule,),
+    )
+
+    first = _persons(builder.build_model(household_number=50, seed=0))
+    second = _persons(builder.build_model(household_number=50, seed=0))
+
+    schedules = [person.schedule for person in first]
+    assert schedules == [person.schedule for person in reversed(second)][::-1]
+
+
+def test_lazy_feature_cannot_be_required_by_eager_one() -> None:
+    generators = (cls() for cls in collect_generators(wroclaw.z_palca))
+    definition = ModelDefinition.from_generators(*generators, lazy_features=[Age])
+
+    with pytest.raises(InvalidFeatureError):
+        definition.compile()
@@ -0,0 +1,61 @@
+import copy
+import gc
+
+from udg.data import rng, wroclaw
+from udg.data.utils import MultinomialSampler, _registry, load_json, shared
+from udg.features.person import Sex
+from udg.types import Region
+
+
+def test_load_json_is_shared() -> None:
+    first = load_json("wroclaw/unsorted/region.json", structure=[Region])
+
+    assert load_json("wroclaw/unsorted/region.json", structure=[Region]) is first
+    assert load_json("wroclaw/unsorted/region.json") is not first
+
+
+def test_shared_data_is_released() -> None:
+    key = ("json", "wroclaw/census/sex.json", (), None)
+    data = load_json("wroclaw/census/sex.json")
+    assert _registry[key] is data
+
+    del data
+    gc.collect()
+
+    assert key not in _registry
+
+
+def test_generators_do_not_mutate_shared_data() -> None:
+    age = load_json("wroclaw/census/age.json", structure=[Sex])
+    age_sex = load_json("wroclaw/unsorted/age_sex.json")
+    expected = copy.deepcopy((age, age_sex))
+
+    # Both of them pop keys out of the data they load, keeping the first ones
+    # alive keeps the data in the registry for the second ones
+    ages = [wroclaw.census.age.AgeSampler() for _ in range(2)]
+    ages_sexes = [wroclaw.unsorted.age_sex.AgeSexSampler() for _ in range(2)]
+
+    assert load_json("wroclaw/census/age.json", structure=[Sex]) is age
+    assert load_json("wroclaw/unsorted/age_sex.json") is age_sex
+    assert (age, age_sex) == expected
+
+    for sex in Sex:
+        first, second = (a._sampler.sampler_for(sex) for a in ages)
+        assert first._values == second._values  # type: ignore[attr-defined]
+
+    draws = []
+    for age_sex_sampler in ages_sexes:
+        rng.seed(0)
+        draws.append([age_sex_sampler.generate() for _ in range(100)])
+    assert draws[0] == draws[1]
+
+
+def test_shared_loads_can_be_nested() -> None:
+    regions = shared(
+        ("regions", "nested"),
+        lambda: MultinomialSampler.from_dict(
+            load_json("wroclaw/unsorted/region.json", structure=[Region])
+        ),
+    )
+
+    assert regions is shared(("regions", "nested"), lambda: None)
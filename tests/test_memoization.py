@@ -0,0 +1,82 @@
+from collections.abc import Sequence
+
+from udg import Builder, Generator, ModelDefinition
+from udg.data import wroclaw
+from udg.data.wroclaw.census.person_number import PersonNumberSampler
+from udg.features.family import PersonNumber
+from udg.features.person import Schedule, TransportPreferences
+from udg.model.profiling import Profiler
+from udg.utils import collect_generators
+
+PERSON_NUMBER = "udg.data.wroclaw.census.person_number.PersonNumberSampler"
+
+
+def _generators() -> tuple:
+    return (
+        *(cls() for cls in collect_generators(wroclaw.census)),
+        wroclaw.z_palca.ScheduleMaker(),
+    )
+
+
+def test_deterministic_generators_are_memoized() -> None:
+    with Profiler() as profiler:
+        builder = Builder(
+            ModelDefinition.from_generators(*_generators()), profiler=profiler
+        )
+        model = builder.build_model(household_number=200, seed=0)
+
+    # Only the distinct (structure, family type, child number) are computed
+    person_number = profiler.report()[PERSON_NUMBER]
+    assert person_number["calls"] < model.family_count
+
+    reference = Builder(
+        ModelDefinition.from_generators(*_generators()), cache_size=0
+    ).build_model(household_number=200, seed=0)
+    assert model.to_dict()["households"] == reference.to_dict()["households"]
+
+
+def test_memoizable_steps() -> None:
+    plan = ModelDefinition.from_generators(*_generators()).compile()
+    memoizable = {
+        type(step.generator).__name__
+        for step in (*plan.household, *plan.family, *plan.person)
+        if step.memoizable
+    }
+
+    assert memoizable == {"PersonNumberSampler"}
+
+
+def test_unhashable_arguments_are_not_memoized() -> None:
+    class SchedulePreferencesSampler(Generator[TransportPreferences]):
+        deterministic = True
+
+        def generate(self, schedule: Schedule) -> TransportPreferences:
+            raise NotImplementedError
+
+    generators = (cls() for cls in collect_generators(wroclaw.z_palca))
+    plan = ModelDefinition.from_generators(
+        *generators, SchedulePreferencesSampler()
+    ).compile()
+    (step,) = [step for step in plan.person if TransportPreferences in step.features]
+
+    assert not step.memoizable
+
+
+def test_memoized_generators_forward_batches() -> None:
+    class BatchPersonNumberSampler(PersonNumberSampler):
+        def __init__(self) -> None:
+            super().__init__()
+            self.batches = 0
+
+        def generate_batch(self, size: int, **columns) -> Sequence[PersonNumber]:
+            self.batches += 1
+            return super().generate_batch(size, **columns)
+
+    sampler = BatchPersonNumberSampler()
+    generators = (
+        *(gen for gen in _generators() if type(gen) is not PersonNumberSampler),
+        sampler,
+    )
+    Builder(ModelDefinition.from_generators(*generators)).build_model_batched(50)
+
+    assert sampler.batches > 0
@@ -0,0 +1,33 @@
+from udg import Builder, ModelDefinition
+from udg.data import wroclaw
+from udg.model.profiling import GeneratorStats, Profiler
+from udg.utils import collect_generators
+
+
+def test_profiler_reports_generators_and_samplers() -> None:
+    generators = (
+        *(cls() for cls in collect_generators(wroclaw.census)),
+        wroclaw.wds2017.bike_number.BikeNumberSampler(),
+        wroclaw.wds2017.car_number.CarNumberSampler(),
+        wroclaw.z_palca.ScheduleMaker(),
+    )
+    calls: list[str] = []
+
+    def hook(stats: GeneratorStats, elapsed: float, sampler_time: float) -> None:
+        calls.append(stats.name)
+
+    with Profiler(hooks=[hook]) as profiler:
+        builder = Builder(
+            ModelDefinition.from_generators(*generators), profiler=profiler
+        )
+        model = builder.build_model(household_number=20, seed=0)
+
+    report = profiler.report()
+    sex = report["udg.data.wroclaw.census.sex.SexSampler"]
+    schedule = report["udg.data.wroclaw.z_palca.ScheduleMaker"]
+
+    assert schedule["calls"] == model.person_count
+    assert schedule["sampler_calls"] == 0
+    assert sex["sampler_calls"] > 0
+    assert sex["sampler_time"] <= sex["total_time"]
+    assert len(calls) == sum(stats["calls"] for stats in report.values())
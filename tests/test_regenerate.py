@@ -0,0 +1,89 @@
+from pathlib import Path
+
+import orjson
+import pytest
+
+from tests.conftest import make_builder
+from udg import Builder
+from udg.data import wroclaw
+from udg.features.family import PersonNumber
+from udg.features.person import Age, Role, Schedule, Sex
+from udg.model.definition import InvalidFeatureError
+from udg.model.model import TrafficModel
+from udg.model.sinks import JsonSink, consume, iter_json_households
+from udg.utils import collect_generators
+
+
+def _without_schedules(data: dict) -> dict:
+    for household in data["households"]:
+        for family in household["families"]:
+            for person in family["persons"]:
+                del person["features"]["Schedule"]
+
+    return data
+
+
+def test_regenerate_only_listed_features(builder: Builder) -> None:
+    model = builder.build_model(household_number=50, seed=0)
+    before = model.to_dict()
+    builder.regenerate(model, [Schedule], seed=1)
+    after = model.to_dict()
+
+    again = TrafficModel.from_dict(before)
+    builder.regenerate(again, [Schedule], seed=1)
+    assert again.to_dict() == after
+
+    assert after != before
+    assert _without_schedules(after) == _without_schedules(before)
+
+
+def test_regenerate_streaming(builder: Builder, tmp_path: Path) -> None:
+    model = builder.build_model(household_number=50, seed=0)
+    consume(
+        iter(model.households), JsonSink(tmp_path / "model.json", model_id=model.id)
+    )
+
+    households = iter_json_households(tmp_path / "model.json")
+    regenerated = builder.iter_regenerated(households, [Schedule], seed=1)
+    consume(regenerated, JsonSink(tmp_path / "regenerated.json", model_id=model.id))
+
+    builder.regenerate(model, [Schedule], seed=1)
+    data = orjson.loads((tmp_path / "regenerated.json").read_bytes())
+    assert data == model.to_dict()
+
+
+def test_affected_features(builder: Builder) -> None:
+    plan = builder.model_definition.compile()
+    affected = plan.affected_by([Age])
+
+    assert [step.features for step in affected.person] == [(Age, Sex), (Schedule,)]
+
+    with pytest.raises(InvalidFeatureError):
+        plan.affected_by([PersonNumber])
+
+
+def _person_features(model: TrafficModel, *features: type) -> list[tuple]:
+    return [
+        tuple(person.features[feature] for feature in features)
+        for household in model.households
+        for family in household.families
+        for person in family.persons
+    ]
+
+
+def test_regenerate_census() -> None:
+    builder = make_builder(*(cls() for cls in collect_generators(wroclaw.census)))
+    model = builder.build_model(household_number=50, seed=0)
+    roles = _person_features(model, Role, Sex)
+    ages = _person_features(model, Age)
+    schedules = _person_features(model, Schedule)
+
+    # Generators taking the family must not be rerun for features before them
+    builder.regenerate(model, [Schedule], seed=1)
+    assert _person_features(model, Role, Sex) == roles
+    assert _person_features(model, Age) == ages
+    assert _person_features(model, Schedule) != schedules
+
+    builder.regenerate(model, [Age], seed=1)
+    assert _person_features(model, Role, Sex) == roles
+    assert _person_features(model, Age) != ages
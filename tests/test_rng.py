@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from udg.data import rng
+
+
+def _thread_generators() -> list[int]:
+    def ids(_: int) -> tuple[int, int]:
+        return id(rng.get_rng()), id(rng.get_rng())
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        return [
+            first for first, second in executor.map(ids, range(2)) if first == second
+        ]
+
+
+def test_threads_have_their_own_generators() -> None:
+    generators = _thread_generators()
+
+    assert len(generators) == 2
+    assert id(rng.get_rng()) not in generators
+
+
+def test_stream_overrides_thread_generator() -> None:
+    generator = np.random.default_rng(0)
+
+    def draw(_: int) -> bool:
+        with rng.stream(generator):
+            return rng.get_rng() is generator
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert all(executor.map(draw, range(2)))
+
+
+def test_buffered_draws_come_from_the_stream() -> None:
+    with rng.stream(np.random.default_rng(0)):
+        uniforms = [rng.uniform() for _ in range(rng.MIN_BLOCK_SIZE + 1)]
+
+    expected = np.random.default_rng(0).random(3 * rng.MIN_BLOCK_SIZE)
+    first_block = expected[: rng.MIN_BLOCK_SIZE][::-1]
+    assert uniforms[:-1] == first_block.tolist()
+    assert uniforms[-1] == expected[-1]
+
+
+def test_buffered_normals() -> None:
+    with rng.stream(np.random.default_rng(0)):
+        normals = np.array([rng.standard_normal() for _ in range(10_000)])
+
+    assert abs(normals.mean()) < 0.05
+    assert abs(normals.std() - 1) < 0.05
@@ -0,0 +1,190 @@
+import pickle
+import threading
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+import attr
+import numpy as np
+import pytest
+
+from udg.data import rng, wroclaw
+from udg.data.utils import (
+    DATA,
+    ConditionalSampler,
+    DecisionTree,
+    DynamicMultinomialSampler,
+    MultinomialSampler,
+    _alias_table,
+    _FenwickTree,
+)
+from udg.features.person import Age, Role, Sex, TransportPreferences
+from udg.types import TransportMode
+
+
+@pytest.mark.parametrize(
+    "probabilities",
+    [[1.0], [0.5, 0.2, 0.2, 0.1, 0.0], [3, 1, 1], np.random.default_rng(0).random(300)],
+)
+def test_alias_table_keeps_probabilities(probabilities: t.Sequence[float]) -> None:
+    array = np.asarray(probabilities, dtype=float)
+    accept, alias = _alias_table(array)
+
+    implied = accept.copy()
+    np.add.at(implied, alias, 1 - accept)
+
+    np.testing.assert_allclose(implied / len(array), array / array.sum(), atol=1e-12)
+
+
+def test_multinomial_sampler() -> None:
+    sampler = MultinomialSampler.from_dict({"a": 0.7, "b": 0.3, "c": 0.0})
+
+    with rng.stream(np.random.default_rng(0)):
+        values = [sampler.sample() for _ in range(10_000)]
+        values.extend(sampler.sample_many(10_000))
+
+    assert set(values) == {"a", "b"}
+    assert values.count("a") / len(values) == pytest.approx(0.7, abs=0.02)
+
+
+def _constant(value: t.Any) -> MultinomialSampler:
+    return MultinomialSampler(values=[value], probabilities=np.array([1.0]))
+
+
+def test_conditional_sampler() -> None:
+    sampler = ConditionalSampler[str](
+        {
+            Sex.F: {Age(10): _constant("a"), Age(20): _constant("b")},
+            Sex.M: {Age(20): _constant("c")},
+        }
+    )
+
+    assert sampler.sample(Sex.F, Age(20)) == "b"
+    assert sampler.sample(Age(20), Sex.M) == "c"
+    assert sampler.sample(Age(10), Role.CHILD, Sex.F) == "a"
+
+    with pytest.raises(KeyError):
+        sampler.sample(Sex.M, Age(10))
+
+
+def test_conditional_sampler_sample_many() -> None:
+    sampler = ConditionalSampler[str](
+        {
+            Sex.F: {Age(10): _constant("a"), Age(20): _constant("b")},
+            Sex.M: {Age(20): _constant("c")},
+        }
+    )
+    sexes = [Sex.M, Sex.F, Sex.F, Sex.M, Sex.F]
+    ages = [Age(20), Age(20), Age(10), Age(20), Age(10)]
+
+    assert sampler.sample_many(sexes, ages) == ["c", "b", "a", "c", "a"]
+    assert sampler.sample_many(ages, sexes) == ["c", "b", "a", "c", "a"]
+    assert sampler.sample_many([], []) == []
+
+    with pytest.raises(KeyError):
+        sampler.sample_many([Sex.M], [Age(10)])
+
+
+def test_transport_preferences_batch() -> None:
+    generator = wroclaw.unsorted.transport_preferences.TransportPreferencesSampler()
+    ages = [Age(3), Age(30), Age(70), Age(5), Age(16)]
+    sexes = [Sex.F, Sex.M, Sex.F, Sex.M, Sex.F]
+
+    with rng.stream(np.random.default_rng(0)):
+        preferences = generator.generate_batch(len(ages), age=ages, sex=sexes)
+
+    assert preferences[0] == preferences[3] == TransportPreferences.for_child()
+    assert all(-1 not in attr.astuple(p) for p in preferences[1:3] + preferences[4:])
+
+
+def test_fenwick_tree() -> None:
+    counts = [3, 0, 1, 5, 0, 2]
+    tree = _FenwickTree.from_counts(counts)
+    tree.add(1, 2)
+    counts[1] += 2
+
+    assert [tree.prefix(i) for i in range(len(counts) + 1)] == [
+        sum(counts[:i]) for i in range(len(counts) + 1)
+    ]
+    assert [tree.find(k) for k in range(sum(counts))] == [
+        i for i, count in enumerate(counts) for _ in range(count)
+    ]
+
+
+def test_dynamic_multinomial_sampler_ranges() -> None:
+    with rng.stream(np.random.default_rng(0)):
+        sampler = DynamicMultinomialSampler.from_dict(
+            {Age(age): 1.0 for age in range(100)}
+        )
+        ranged = [sampler.sample(from_=30, to=40) for _ in range(1000)]
+        normal = [sampler.sample_normal(mu=60, sigma=3, from_=50) for _ in range(100)]
+
+    assert all(30 <= age <= 40 for age in ranged)
+    assert all(age >= 50 for age in normal)
+    assert np.mean(normal) == pytest.approx(60, abs=2)
+    buffer = sampler._buffer()
+    assert buffer.tree.prefix(100) == buffer.counts.sum() == 1000
+
+
+def test_dynamic_multinomial_sampler_truncated_fallback() -> None:
+    with rng.stream(np.random.default_rng(0)):
+        sampler = DynamicMultinomialSampler(
+            classic_sampler=MultinomialSampler.from_dict(
+                {Age(age): 1.0 if age < 90 else 1e-6 for age in range(100)}
+            ),
+            buffer_size=10,
+        )
+        ages = [sampler.sample(from_=95) for _ in range(5)]
+        ages.append(sampler.sample_normal(mu=99, sigma=1, from_=95))
+
+        with pytest.raises(ValueError):
+            sampler.sample(from_=120)
+
+    assert all(95 <= age <= 99 for age in ages)
+    assert sampler.truncated_draws == 6
+
+
+def test_dynamic_multinomial_sampler_threads() -> None:
+    sampler = DynamicMultinomialSampler.from_dict({Age(age): 1.0 for age in range(100)})
+
+    barrier = threading.Barrier(4)
+
+    def draw(seed: int) -> list[Age]:
+        with rng.stream(np.random.default_rng(seed)):
+            return [sampler.sample(from_=30, to=40) for _ in range(2000)]
+
+    def draw_in_thread(seed: int) -> list[Age]:
+        barrier.wait()
+        return draw(seed)
+
+    # Outside of segments every thread draws from its own buffer
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(draw_in_thread, [0, 1, 0, 1]))
+
+    assert results[0] == results[2] == draw(0)
+    assert results[1] == results[3]
+
+
+def test_decision_tree_matches_sklearn() -> None:
+    path = DATA / "wroclaw/kbr/transport_mode.pkl"
+    classifier = pickle.loads(path.read_bytes())
+    tree = DecisionTree.from_classifier(classifier, out=TransportMode)
+
+    generator = np.random.default_rng(0)
+    rows = np.column_stack(
+        [
+            *(generator.integers(-1, 6, size=(5000, 4)).T),
+            generator.integers(1, 8, size=5000),
+            generator.integers(0, 6, size=5000),
+            generator.integers(0, 4, size=5000),
+            generator.integers(0, 4, size=5000),
+            generator.uniform(0, 30, size=5000),
+        ]
+    )
+    # Values right at the thresholds, where float32 rounding matters
+    thresholds = classifier.tree_.threshold[classifier.tree_.feature >= 0]
+    rows[:1000, 8] = generator.choice(thresholds, 1000)
+
+    expected = [TransportMode(mode) for mode in classifier.predict(rows)]
+
+    assert tree.predict_many(rows) == expected
+    assert [tree.predict(*row) for row in rows.tolist()] == expected
@@ -0,0 +1,92 @@
+import polars as pl
+import pytest
+
+from udg.data import facilities as facilities_module
+from udg.data import rng
+from udg.data.utils import _structure_dict, load_json
+from udg.data.wroclaw.unsorted import schedule
+from udg.features.family import BikeNumber, CarNumber, PersonNumber
+from udg.features.household.home import Home
+from udg.features.person import Age, Sex, TransportPreferences
+from udg.types import Region
+
+REGIONS = [1, 2, 3]
+
+
+@pytest.fixture
+def schedule_maker(monkeypatch: pytest.MonkeyPatch) -> schedule.ScheduleMaker:
+    # The OSM facilities and the travel matrices are not shipped with the repo
+    tag_mapping = load_json("osm/tag_mappings.json")
+    missing: dict[str, dict] = {
+        "wroclaw/unsorted/gravities.json": {
+            dest: {str(a): {str(b): 1 / len(REGIONS) for b in REGIONS} for a in REGIONS}
+            for dest in tag_mapping
+        },
+        "wroclaw/unsorted/distances.json": {
+            str(a): {str(b): abs(a - b) * 2.5 for b in REGIONS} for a in REGIONS
+        },
+    }
+    facilities = pl.DataFrame(
+        [
+            {
+                "id": f"{tag}_{region}",
+                "tag": tag,
+                "region_id": region,
+                "x": 1.5,
+                "y": 2.5,
+            }
+            for tags in tag_mapping.values()
+            for tag in tags
+            for region in REGIONS
+        ]
+    )
+
+    def fake_load_json(relative_path: str, structure=None, out=None) -> dict:
+        if relative_path in missing:
+            return _structure_dict(missing[relative_path], structure, out)
+        return load_json(relative_path, structure, out)
+
+    monkeypatch.setattr(schedule, "load_json", fake_load_json)
+    monkeypatch.setattr(facilities_module, "load_csv", lambda _: facilities)
+    return schedule.ScheduleMaker()
+
+
+def _persons(n: int) -> dict[str, list]:
+    generator = rng.get_rng()
+    ages = generator.integers(0, 90, size=n).tolist()
+    return {
+        "person_number": [PersonNumber(v) for v in generator.integers(1, 6, size=n)],
+        "car_number": [CarNumber(v) for v in generator.integers(0, 3, size=n)],
+        "bike_number": [BikeNumber(v) for v in generator.integers(0, 3, size=n)],
+        "age": [Age(age) for age in ages],
+        "sex": [Sex.F if v else Sex.M for v in generator.integers(0, 2, size=n)],
+        "home": [
+            Home(id="home", region=Region(v), x=0, y=0)
+            for v in generator.integers(1, 4, size=n)
+        ],
+        "transport_preferences": [
+            (
+                TransportPreferences.for_child()
+                if age <= 5
+                else TransportPreferences(*generator.integers(1, 6, size=4).tolist())
+            )
+            for age in ages
+        ],
+    }
+
+
+def test_schedule_batch_matches_single(schedule_maker: schedule.ScheduleMaker) -> None:
+    rng.seed(0)
+    persons = _persons(500)
+
+    rng.seed(1)
+    batch = schedule_maker.generate_batch(500, **persons)
+
+    rng.seed(1)
+    single = [
+        schedule_maker.generate(**{name: column[i] for name, column in persons.items()})
+        for i in range(500)
+    ]
+
+    assert batch == single
+    assert sum(len(s.stops) for s in batch) > 0
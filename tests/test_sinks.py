@@ -0,0 +1,40 @@
+from pathlib import Path
+from xml.etree import ElementTree as ET
+
+import orjson
+
+from udg import Builder, TrafficModel
+from udg.model.sinks import JsonSink, MatsimXmlSink, StatisticsSink, consume
+
+
+def test_sinks_match_traffic_model(builder: Builder, tmp_path: Path) -> None:
+    model = builder.build_model_until(person_number=200, seed=3)
+    json_sink = JsonSink(tmp_path / "model.json", model_id=model.id)
+    xml_sink = MatsimXmlSink(tmp_path / "model.xml")
+    statistics = StatisticsSink()
+
+    consume(builder.iter_households_until(200, seed=3), json_sink, xml_sink, statistics)
+
+    assert orjson.loads((tmp_path / "model.json").read_bytes()) == model.to_dict()
+    model.to_matsim_xml().write(tmp_path / "expected.xml")
+    assert ET.canonicalize(from_file=tmp_path / "model.xml") == ET.canonicalize(
+        from_file=tmp_path / "expected.xml"
+    )
+    assert statistics.household_count == model.household_count
+    assert statistics.family_count == model.family_count
+    assert statistics.person_count == model.person_count
+    assert sum(statistics.to_dict()["feature_counts"]["Sex"].values()) == (
+        model.person_count
+    )
+
+
+def test_iter_households_until_stops_at_target(builder: Builder) -> None:
+    households = list(builder.iter_households_until(person_number=100, seed=1))
+    model = TrafficModel(households=households)
+
+    assert model.person_count >= 100
+    assert (
+        model.person_count
+        - sum(family.person_number for family in households[-1].families)
+        < 100
+    )